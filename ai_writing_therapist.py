@@ -1,5 +1,7 @@
 # ai_writing_therapist.py
 import random
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from chat_sessions import classify
 # Defined topics based on mood
 topics = {
     "good": [
@@ -44,11 +46,25 @@ empathetic_feedback = {
     ]
 }
 
-def generate_feedback(mood):
-    # Randomly select an empathetic response based on mood
+# Mood whose feedback fits each sentiment detected in an entry
+MOODS_BY_SENTIMENT = {"positive": "good", "neutral": "neutral", "negative": "bad"}
+
+def feedback_mood(score, mood=None):
+    """Mood to answer an entry with: what its text says (compound score), unless that is neutral and the writer said otherwise."""
+    sentiment = classify(score)
+    if sentiment == 'neutral' and mood in empathetic_feedback:
+        return mood
+    return MOODS_BY_SENTIMENT[sentiment]
+
+def generate_feedback(mood, prompt=None):
+    # Feedback and topics are written in pairs, so an entry on one of this mood's topics gets its own reply
+    if prompt in topics[mood]:
+        return empathetic_feedback[mood][topics[mood].index(prompt)]
+    # Otherwise randomly select an empathetic response based on mood
     return random.choice(empathetic_feedback[mood])
 
 def main():
+    analyzer = SentimentIntensityAnalyzer()
     print("Welcome to the AI Writing Therapist! Let's start by checking your mood.")
     
     while True:
@@ -66,8 +82,9 @@ def main():
         # Ask the user for their journal entry
         journal_entry = input("\nPlease write your journal entry: ")
         
-        # Generate empathetic feedback based on mood
-        feedback = generate_feedback(mood)
+        # Generate empathetic feedback based on what was written as well as the mood
+        score = analyzer.polarity_scores(journal_entry)['compound']
+        feedback = generate_feedback(feedback_mood(score, mood), topic)
         
         # Display the generated feedback
         print("\nAI Feedback:\n")
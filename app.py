@@ -1,21 +1,38 @@
 # app.py
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import random
 import logging
+import math
+import time
 import pandas as pd
-import csv
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.cluster import KMeans
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import json
 import numpy as np
+from ai_writing_therapist import feedback_mood, generate_feedback, topics
+from habit_recommendation import FEATURES, HABIT_FILE, compile_lookup, lookup_habit, lookup_habits, train_model
+import music_catalog
+import chat_sessions
+import data_cache
+import journal_log
+import metrics
+import model_registry
+import request_log
+import response_cache
+import sentiment_batch
+import sentiment_scheduler
+import snapshot
+import track_streaming
+from habit_clustering import HABITS_FILE, get_cluster_index, seed_cluster_index, recommend_from_index, recommend_optimal, best_overall_plan
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
 
+# Set by warm_up() once all models and catalogs are built
+ready = False
+
 # Custom JSON Encoder for handling NumPy types
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -28,216 +45,603 @@ class CustomJSONEncoder(json.JSONEncoder):
 # Set the custom JSON encoder
 app.json_encoder = CustomJSONEncoder
 
-# Configure logging
-logging.basicConfig(filename='app.log', level=logging.INFO, 
-                    format='%(asctime)s %(levelname)s: %(message)s')
+# Time every JSON serialization as its own stage
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with metrics.stage('json_encode'):
+            return super().dumps(obj, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+# Configure logging (SERENE_LOG_MODE=queue writes structured events from a background thread)
+request_log.setup_logging('app.log')
+
+# Load the prebuilt snapshot (see snapshot.py); anything missing or stale is built from the CSV files
+snapshot_artifacts, snapshot_digests = snapshot.load_snapshot()
 
 # Load models and sentiment analyzer
-sentiment_analyzer = SentimentIntensityAnalyzer()
+sentiment_analyzer = snapshot_artifacts.get('sentiment_analyzer') or SentimentIntensityAnalyzer()
+
+# The same lexicon compiled for scoring /batch sub-requests together
+sentiment_engine = sentiment_batch.compile_engine(sentiment_analyzer)
+
+# Micro-batches concurrent /chatbot and /journal scoring when SERENE_SENTIMENT_BATCHING is set
+scheduler = sentiment_scheduler.create_scheduler(sentiment_engine)
 
-# Load habit recommendation data
-habit_data = pd.read_csv('habit_data.csv')
+# Largest number of questionnaires accepted by /recommend_habit/batch
+MAX_HABIT_BATCH = 10000
 
-# Preprocess the data
-# Encode categorical variables
-le_exercise = LabelEncoder()
-le_social_media = LabelEncoder()
-le_stress = LabelEncoder()
-le_mindfulness = LabelEncoder()
+# Largest page of tracks returned by /music_recommendation
+MAX_MUSIC_PAGE = 1000
 
-habit_data['exercise_frequency'] = le_exercise.fit_transform(habit_data['exercise_frequency'])
-habit_data['social_media_hours'] = le_social_media.fit_transform(habit_data['social_media_hours'])
-habit_data['stress_level'] = le_stress.fit_transform(habit_data['stress_level'])
-habit_data['mindfulness_frequency'] = le_mindfulness.fit_transform(habit_data['mindfulness_frequency'])
+# Largest number of sub-requests accepted by /batch
+MAX_BATCH_REQUESTS = 100
 
-# Features and target variable
-X = habit_data.drop('recommended_habit', axis=1)
-y = habit_data['recommended_habit']
+# Writing prompts by mood for /ai_writing_therapist (defined in ai_writing_therapist.py)
+WRITING_TOPICS = topics
 
-# Create and train the Decision Tree model
-model = DecisionTreeClassifier(random_state=42)
-model.fit(X, y)
+# Replies once a session has had chat_sessions.ESCALATE_AFTER negative messages in a row
+SUPPORT_RESPONSES = [
+    "It sounds like things have been hard for a while. Would it help to talk to someone you trust about how you're feeling?",
+    "You've been carrying a lot lately. If it ever feels like too much, please consider reaching out to a mental health professional.",
+    "I'm here with you. It might help to take a short break, breathe slowly, and let someone close to you know how you're doing."
+]
 
-# Load music data
-music_data = pd.read_csv('music_data.csv')
+# Conversation state for clients that send a session_id (see chat_sessions.py)
+sessions = chat_sessions.SessionStore()
 
-# Prepare response pools for chatbot
-positive_responses = []
-neutral_responses = []
-negative_responses = []
+# Encoded /music_recommendation and /habit_clustering responses, per data version (see response_cache.py)
+responses = response_cache.ResponseCache()
+
+# Journal entries from /journal, with per-user daily mood aggregates (see journal_log.py); None when
+# SERENE_JOURNAL_DIR is empty
+journal = journal_log.JournalLog() if journal_log.JOURNAL_DIR else None
+
+# Snapshotted catalogs are installed in their module caches, which then only parse appended rows
+if 'music_catalog' in snapshot_artifacts:
+    music_catalog.seed_catalog(snapshot_artifacts['music_catalog'], snapshot_digests['music_catalog'])
+if 'cluster_index' in snapshot_artifacts:
+    seed_cluster_index(snapshot_artifacts['cluster_index'], snapshot_digests['cluster_index'].hexdigest())
 
 # Load responses from CSV for the chatbot
 def load_responses(filename):
-    global positive_responses, neutral_responses, negative_responses
-    with open(filename, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row['Sentiment'] == 'Positive':
-                positive_responses.append(row['Response'])
-            elif row['Sentiment'] == 'Neutral':
-                neutral_responses.append(row['Response'])
-            elif row['Sentiment'] == 'Negative':
-                negative_responses.append(row['Response'])
-
-# Load initial responses
-load_responses('responses.csv')
-
-# Load habits data for clustering
-def load_data():
-    """Load habits data from CSV."""
-    data = pd.read_csv('habits_data.csv')  # Ensure this CSV contains 'habit_name' and 'time_needed'
-    return data
-
-def preprocess_and_cluster(data):
-    """Standardize and cluster habits based on time needed."""
-    # Standardize the "time_needed" column
-    scaler = StandardScaler()
-    data['time_needed_scaled'] = scaler.fit_transform(data[['time_needed']])
-
-    # Apply K-means clustering
-    kmeans = KMeans(n_clusters=3, random_state=42)
-    data['cluster'] = kmeans.fit_predict(data[['time_needed_scaled']])
-    
-    # Sort clusters based on average time, from shortest to longest
-    cluster_order = data.groupby('cluster')['time_needed'].mean().sort_values().index
-    cluster_mapping = {cluster: i for i, cluster in enumerate(cluster_order)}
-    data['ordered_cluster'] = data['cluster'].map(cluster_mapping)
-    
-    # Drop the scaled column to simplify output
-    data.drop(columns='time_needed_scaled', inplace=True)
-    
-    return data
-
-def recommend_habits(data, available_time):
-    """Recommend habits based on available time."""
-    recommendations = []
-    for cluster in data['ordered_cluster'].unique():
-        cluster_data = data[data['ordered_cluster'] == cluster]
-        
-        total_time = 0
-        selected_habits = []
-        
-        # Select habits until reaching the user's available time
-        for _, row in cluster_data.iterrows():
-            if total_time + row['time_needed'] > available_time:
-                break
-            selected_habits.append(row['habit_name'])
-            total_time += row['time_needed']
-        
-        if selected_habits:
-            recommendations.append({
-                "cluster": cluster,
-                "habits": selected_habits,
-                "total_time": total_time
-            })
-    
-    return recommendations
+    """Return the (positive, neutral, negative) response pools from filename."""
+    pools = {'Positive': [], 'Neutral': [], 'Negative': []}
+    data = data_cache.load_csv(filename)
+    for sentiment, response in zip(data['Sentiment'].tolist(), data['Response'].tolist()):
+        if sentiment in pools:
+            pools[sentiment].append(response)
+    return pools['Positive'], pools['Neutral'], pools['Negative']
+
+def validate_response_pools(pools):
+    if not all(pools):
+        raise ValueError("Every sentiment needs at least one response")
+
+def build_habit_lookup(filename):
+    # Habit recommendation tree, compiled into a lookup table (trained in habit_recommendation.py)
+    return compile_lookup(*train_model(filename))
+
+def validate_habit_lookup(lookup):
+    if not lookup['answers']:
+        raise ValueError("The habit model has no answers")
+
+def validate_music_catalog(catalog):
+    if not catalog['moods']:
+        raise ValueError("The music catalog has no tracks")
+
+def validate_cluster_index(index):
+    if not index['clusters']:
+        raise ValueError("The habit catalog has no clusters")
+
+# Models and catalogs, rebuilt in the background when their CSV file changes (see model_registry.py).
+# Handlers read each artifact once per request, so a reload never mixes versions within a request.
+registry = model_registry.ModelRegistry()
+registry.register('habit_lookup', HABIT_FILE, build_habit_lookup, validate_habit_lookup,
+                  snapshot_artifacts.get('habit_lookup'))
+registry.register('response_pools', 'responses.csv', load_responses, validate_response_pools,
+                  snapshot_artifacts.get('response_pools'))
+registry.register('music_catalog', music_catalog.MUSIC_FILE, music_catalog.get_catalog, validate_music_catalog)
+registry.register('cluster_index', HABITS_FILE, get_cluster_index, validate_cluster_index)
+registry.start()
+
+@app.before_request
+def start_request_timer():
+    g.started = time.perf_counter()
+    g.log_fields = {}
+    g.profiler = metrics.start_profile()
+
+@app.after_request
+def record_request(response):
+    # Only appends to an in-memory buffer; the disk write happens on the log writer thread
+    latency = time.perf_counter() - g.started
+    # Unmatched URLs share one label, so 404 traffic cannot create a series per path
+    endpoint = request.url_rule.rule if request.url_rule else '<unmatched>'
+    metrics.observe_request(endpoint, latency)
+    request_log.log_request(endpoint, latency, g.log_fields, response.status_code)
+    if g.profiler is not None:
+        metrics.finish_profile(g.profiler)
+    return response
 
 # Endpoints
 
+def cached_response(name, key, render):
+    """Response to a request answered from registry artifact name alone, via render(artifact) -> (body, status).
+
+    Successful responses are cached encoded under key (None skips the cache) until the artifact
+    is rebuilt, with an ETag from its data version; a matching If-None-Match gets 304 Not Modified.
+    """
+    artifact, version = registry.get_versioned(name)
+    entry = None
+    if key is not None:
+        entry = responses.get(name, version, key)
+        g.log_fields['response_cache'] = 'miss' if entry is None else 'hit'
+    if entry is None:
+        body, status = render(artifact)
+        if status != 200:
+            return jsonify(body), status
+        # Music pages arrive pre-encoded
+        encoded = body.encode('utf-8') if isinstance(body, str) else jsonify(body).get_data()
+        if key is None:
+            return app.response_class(encoded, mimetype='application/json')
+        entry = responses.put(name, version, key, encoded)
+
+    etag, encoded = entry
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(encoded, mimetype='application/json')
+    response.set_etag(etag)
+    if response_cache.MAX_AGE > 0:
+        response.cache_control.max_age = response_cache.MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def score_sentiment(text):
+    """Compound score of one text, through the micro-batching scheduler when it is enabled."""
+    if scheduler is None:
+        return sentiment_analyzer.polarity_scores(text)['compound']
+    return scheduler.score(text)
+
+def pick_response(pools, sentiment_score):
+    """Return (detected sentiment, reply from that sentiment's pool) for a compound score."""
+    positive_responses, neutral_responses, negative_responses = pools
+    sentiment = chat_sessions.classify(sentiment_score)
+    if sentiment == 'positive':
+        return sentiment, random.choice(positive_responses)
+    elif sentiment == 'negative':
+        return sentiment, random.choice(negative_responses)
+    return sentiment, random.choice(neutral_responses)
+
+def chatbot_reply(pools, sentiment_score, session_id=None):
+    """Return (response body, detected sentiment); with a session the reply follows the conversation."""
+    if session_id is None:
+        sentiment, response = pick_response(pools, sentiment_score)
+        return {"response": response}, sentiment
+
+    positive_responses, neutral_responses, negative_responses = pools
+    sentiment, response, escalated, trend = sessions.reply(session_id, sentiment_score, {
+        "positive": positive_responses,
+        "neutral": neutral_responses,
+        "negative": negative_responses,
+        "support": SUPPORT_RESPONSES
+    })
+    return {"response": response, "escalated": escalated, "mood_trend": round(trend, 4)}, sentiment
+
+def valid_session_id(session_id):
+    return session_id is None or (isinstance(session_id, str)
+                                  and 0 < len(session_id) <= chat_sessions.MAX_SESSION_ID_LENGTH)
+
 @app.route('/chatbot', methods=['POST'])
 def chatbot_response():
     """Chatbot response based on user input sentiment."""
     data = request.json
     user_input = data.get('input', '')
-    score = sentiment_analyzer.polarity_scores(user_input)
-    sentiment_score = score['compound']
-    
-    if sentiment_score >= 0.05:
-        detected_sentiment = 'positive'
-        response = random.choice(positive_responses)
-    elif sentiment_score <= -0.05:
-        detected_sentiment = 'negative'
-        response = random.choice(negative_responses)
-    else:
-        detected_sentiment = 'neutral'
-        response = random.choice(neutral_responses)
+    session_id = data.get('session_id')
+    if not valid_session_id(session_id):
+        return jsonify({"error": f"Invalid session_id. Expected a string of at most {chat_sessions.MAX_SESSION_ID_LENGTH} characters."}), 400
+
+    with metrics.stage('vader'):
+        score = score_sentiment(user_input)
+    body, detected_sentiment = chatbot_reply(registry.get('response_pools'), score, session_id)
 
+    g.log_fields['sentiment'] = detected_sentiment
     logging.info(f"Chatbot detected sentiment: {detected_sentiment}")
-    return jsonify({"response": response})
+    return jsonify(body)
 
 @app.route('/ai_writing_therapist', methods=['POST'])
 def ai_writing_therapist():
     """Provide writing prompts based on user mood."""
     data = request.json
-    mood = data.get('mood', '').lower()
-    topics = {
-        "good": ["Describe a recent accomplishment you're proud of."],
-        "neutral": ["What is a daily routine you enjoy?"],
-        "bad": ["Write about a challenge you're currently facing."]
-    }
-
-    if mood not in topics:
-        return jsonify({"error": "Invalid mood. Please choose from good, neutral, or bad."}), 400
+    body, status = writing_prompt(data)
+    return jsonify(body), status
+
+def writing_prompt(data):
+    mood = data.get('mood', '')
+    if not isinstance(mood, str) or mood.lower() not in WRITING_TOPICS:
+        return {"error": "Invalid mood. Please choose from good, neutral, or bad."}, 400
+    return {"prompt": random.choice(WRITING_TOPICS[mood.lower()])}, 200
+
+def validate_journal_entry(data):
+    """Return the error message for an invalid /journal payload, or None."""
+    user_id, entry, mood, prompt = data.get('user_id'), data.get('entry'), data.get('mood'), data.get('prompt')
+    if not isinstance(user_id, str) or not 0 < len(user_id) <= journal_log.MAX_USER_ID_LENGTH:
+        return f"Invalid user_id. Expected a string of at most {journal_log.MAX_USER_ID_LENGTH} characters."
+    if not isinstance(entry, str) or not entry.strip() or len(entry) > journal_log.MAX_ENTRY_LENGTH:
+        return f"Invalid entry. Expected a non-empty string of at most {journal_log.MAX_ENTRY_LENGTH} characters."
+    if mood is not None and (not isinstance(mood, str) or mood.lower() not in WRITING_TOPICS):
+        return "Invalid mood. Please choose from good, neutral, or bad."
+    if prompt is not None and not isinstance(prompt, str):
+        return "Invalid prompt. Expected a string."
+    return None
+
+def record_journal_entries(payloads, scores):
+    """Save valid /journal payloads with their compound scores in one commit; returns the response bodies."""
+    records = []
+    bodies = []
+    for payload, score in zip(payloads, scores):
+        mood = payload['mood'].lower() if payload.get('mood') else None
+        sentiment = chat_sessions.classify(score)
+        records.append(journal_log.make_record(payload['user_id'], payload['entry'], score, sentiment,
+                                               mood, payload.get('prompt')))
+        feedback = generate_feedback(feedback_mood(score, mood), payload.get('prompt'))
+        bodies.append({"sentiment": sentiment, "score": score, "feedback": feedback})
+    if journal is None:
+        raise OSError("journaling is disabled")
+    with metrics.stage('journal_commit'):
+        journal.append(records)
+    return bodies
+
+@app.route('/journal', methods=['POST'])
+def journal_entry():
+    """Save a journal entry and reply with feedback on what was written."""
+    data = request.json
+    error = validate_journal_entry(data) if isinstance(data, dict) else "Invalid input. Expected an object."
+    if error is not None:
+        return jsonify({"error": error}), 400
 
-    topic = random.choice(topics[mood])
-    return jsonify({"prompt": topic})
+    with metrics.stage('vader'):
+        score = score_sentiment(data['entry'])
+    try:
+        body, = record_journal_entries([data], [score])
+    except OSError:
+        return jsonify({"error": "The journal entry could not be saved. Please try again."}), 503
+
+    g.log_fields['sentiment'] = body['sentiment']
+    return jsonify(body)
+
+@app.route('/journal/<user_id>/moods', methods=['GET'])
+def journal_moods(user_id):
+    """A user's mood per day, from their journal entries."""
+    days = request.args.get('days', type=int)
+    if len(user_id) > journal_log.MAX_USER_ID_LENGTH or (days is not None and days < 0):
+        return jsonify({"error": "Invalid user_id or days."}), 400
+    if journal is None:
+        return jsonify({"error": "Journaling is disabled."}), 503
+    with metrics.stage('journal_moods'):
+        moods = journal.daily_moods(user_id, days)
+    return jsonify({"user_id": user_id, "days": moods})
 
 @app.route('/recommend_habit', methods=['POST'])
 def recommend_habit_endpoint():
     """Recommend a habit based on user data."""
     user_data = request.json
-    required_keys = ['exercise_frequency', 'social_media_hours', 'stress_level', 'mindfulness_frequency']
+    required_keys = FEATURES
     
     # Validate input
     if not all(key in user_data for key in required_keys):
         return jsonify({'error': 'Invalid input. All fields are required.'}), 400
-    
-    # Get user input
-    exercise_freq = user_data['exercise_frequency']
-    social_media_hours = user_data['social_media_hours']
-    stress_level = user_data['stress_level']
-    mindfulness_freq = user_data['mindfulness_frequency']
 
     # Recommend a habit based on user input
     try:
-        user_input = pd.DataFrame({
-            'exercise_frequency': [le_exercise.transform([exercise_freq])[0]],
-            'social_media_hours': [le_social_media.transform([social_media_hours])[0]],
-            'stress_level': [le_stress.transform([stress_level])[0]],
-            'mindfulness_frequency': [le_mindfulness.transform([mindfulness_freq])[0]]
-        })
-
-        recommended_habit = model.predict(user_input)
-        logging.info(f"Recommended habit: {recommended_habit[0]}")
-        return jsonify({'recommended_habit': recommended_habit[0]})
+        with metrics.stage('habit_lookup'):
+            recommended_habit = lookup_habit(registry.get('habit_lookup'), [user_data[key] for key in required_keys])
+        g.log_fields['recommended_habit'] = recommended_habit
+        logging.info(f"Recommended habit: {recommended_habit}")
+        return jsonify({'recommended_habit': recommended_habit})
     except ValueError as e:
         logging.error(f"ValueError in recommend_habit: {str(e)}")
         return jsonify({"error": f"Invalid input value: {str(e)}"}), 400
 
+@app.route('/recommend_habit/batch', methods=['POST'])
+def recommend_habit_batch():
+    """Recommend habits for many questionnaires in one call."""
+    data = request.json
+    questionnaires = data.get('questionnaires') if isinstance(data, dict) else None
+
+    if not isinstance(questionnaires, list):
+        return jsonify({'error': 'Invalid input. Expected a list of questionnaires.'}), 400
+    if len(questionnaires) > MAX_HABIT_BATCH:
+        return jsonify({'error': f'Too many questionnaires. The limit is {MAX_HABIT_BATCH}.'}), 413
+
+    results = []
+    with metrics.stage('habit_batch_lookup'):
+        habits = lookup_habits(registry.get('habit_lookup'), questionnaires)
+    for habit in habits:
+        if isinstance(habit, ValueError):
+            results.append({"error": f"Invalid input value: {str(habit)}"})
+        else:
+            results.append({"recommended_habit": habit})
+
+    g.log_fields['batch_size'] = len(questionnaires)
+    logging.info(f"Recommended habits for a batch of {len(questionnaires)}")
+    return jsonify({"results": results})
+
 @app.route('/music_recommendation', methods=['POST'])
 def music_recommendation():
     """Recommend music based on mood."""
-    mood = request.json.get('mood', '').lower()
-    filtered_data = music_data[music_data['mood'].str.lower() == mood]
+    user_data = request.json
+    if not isinstance(user_data, dict):
+        return jsonify({'error': 'Invalid input. Expected a JSON object.'}), 400
+
+    def render(catalog):
+        with metrics.stage('music_page'):
+            return music_page(catalog, user_data)
+
+    return cached_response('music_catalog', music_page_key(user_data), render)
+
+def music_page_key(user_data):
+    # Payloads asking for the same page share a key; invalid ones are not cached
+    offset = user_data.get('offset', 0)
+    limit = user_data.get('limit', music_catalog.DEFAULT_PAGE_SIZE)
+    # The same check as music_page(), so only pages it would serve get a key
+    if not valid_page_bounds(offset, limit):
+        return None
+    mood = user_data.get('mood', '')
+    return 'music_page', music_catalog.normalize_mood(mood) if isinstance(mood, str) else '', offset, limit
+
+def valid_page_bounds(offset, limit):
+    # JSON true/false arrive as bool, a subclass of int
+    if isinstance(offset, bool) or isinstance(limit, bool):
+        return False
+    return isinstance(offset, int) and isinstance(limit, int) and offset >= 0 and 0 < limit <= MAX_MUSIC_PAGE
+
+def music_page(catalog, user_data):
+    """Return (pre-encoded JSON page, 200) or (error dict, status) for a /music_recommendation payload."""
+    mood = user_data.get('mood', '')
+    offset = user_data.get('offset', 0)
+    limit = user_data.get('limit', music_catalog.DEFAULT_PAGE_SIZE)
+
+    if not valid_page_bounds(offset, limit):
+        return {"error": f"Invalid offset or limit. The limit must be between 1 and {MAX_MUSIC_PAGE}."}, 400
 
-    if filtered_data.empty:
-        return jsonify({"error": "No songs found for that mood."}), 404
+    # Tracks are pre-indexed and pre-encoded per mood, so only the requested page is joined
+    page = music_catalog.get_page(catalog, mood.lower() if isinstance(mood, str) else '', offset, limit)
+    if page is None:
+        return {"error": "No songs found for that mood."}, 404
 
-    recommendations = filtered_data[['title', 'file_path']].to_dict(orient='records')
-    return jsonify({"recommendations": recommendations})
+    recommendations, total = page
+    # Only the pre-encoded tracks are spliced in; the rest of the envelope goes through the encoder
+    envelope = json.dumps({"total": total, "offset": offset, "limit": limit})
+    return f'{{"recommendations": {recommendations}, {envelope[1:]}', 200
+
+
+@app.route('/tracks/<int:track_id>/stream', methods=['GET'])
+def stream_track(track_id):
+    """Stream a track's audio, with Range and ETag support."""
+    track = music_catalog.get_track(registry.get('music_catalog'), track_id)
+    if track is None:
+        return jsonify({"error": "Track not found."}), 404
+
+    path = track_streaming.resolve_track_file(track['file_path'])
+    if path is None:
+        return jsonify({"error": "Audio file for this track is not available."}), 404
+
+    return track_streaming.stream_file(path)
 
 
 @app.route('/habit_clustering', methods=['POST'])
 def habit_clustering():
     """Cluster habits based on user’s available time."""
+    # The clustered catalog is only refit when habits_data.csv changes
     user_data = request.json
+    if not isinstance(user_data, dict):
+        return jsonify({'error': 'Invalid input. Expected a JSON object.'}), 400
+    return cached_response('cluster_index', habit_plan_key(user_data), lambda index: habit_plan(index, user_data))
+
+def habit_plan_key(user_data):
+    # Habit times are whole minutes, so every budget within the same minute gets the same plan
     time_available = user_data.get('time_available', 0)
+    mode = user_data.get('mode', 'optimal')
+    if mode not in ('optimal', 'greedy') or isinstance(time_available, bool) \
+            or not isinstance(time_available, (int, float)) or not math.isfinite(time_available):
+        return None
+    return 'habit_plan', mode, math.floor(time_available)
+
+def habit_plan(cluster_index, user_data):
+    """Return (body, status) for a /habit_clustering payload."""
+    time_available = user_data.get('time_available', 0)
+    mode = user_data.get('mode', 'optimal')
 
-    # Load and preprocess the data
-    habits_data = load_data()
-    clustered_data = preprocess_and_cluster(habits_data)
+    if mode not in ('optimal', 'greedy'):
+        return {"error": "Invalid mode. Please choose from optimal or greedy."}, 400
+    # The JSON parser also accepts Infinity and NaN
+    if isinstance(time_available, bool) or not isinstance(time_available, (int, float)) \
+            or not math.isfinite(time_available):
+        return {"error": "Invalid time_available. Expected a number of minutes."}, 400
 
     # Get recommendations based on available time
-    recommendations = recommend_habits(clustered_data, time_available)
+    with metrics.stage('habit_plan'):
+        if mode == 'greedy':
+            recommendations = recommend_from_index(cluster_index, time_available)
+            best_plan = None
+        else:
+            recommendations = recommend_optimal(cluster_index, time_available)
+            best_plan = best_overall_plan(cluster_index, time_available)
 
     # Convert recommendations to native Python types if necessary
     recommendations = convert_to_native(recommendations)
 
     if not recommendations:
-        return jsonify({"error": "No habits fit within your available time."}), 404
-
-    return jsonify({"recommendations": recommendations})
+        return {"error": "No habits fit within your available time."}, 404
+
+    if best_plan is None:
+        return {"recommendations": recommendations}, 200
+    return {"recommendations": recommendations, "best_plan": convert_to_native(best_plan)}, 200
+
+def _batch_chatbot(models, payloads):
+    # One vectorized scoring call for every message in the batch
+    texts = [payload.get('input', '') for payload in payloads]
+    valid = [i for i, text in enumerate(texts)
+             if isinstance(text, str) and valid_session_id(payloads[i].get('session_id'))]
+    results = [({"error": "Invalid input. Expected a string and an optional session_id."}, 400)] * len(payloads)
+    scores = sentiment_batch.score_many([texts[i] for i in valid], sentiment_engine)
+    for i, score in zip(valid, scores.tolist()):
+        body, _ = chatbot_reply(models['response_pools'], score, payloads[i].get('session_id'))
+        results[i] = (body, 200)
+    return results
+
+def _batch_journal(models, payloads):
+    # Every valid entry is scored in one vectorized call and saved in one commit
+    errors = [validate_journal_entry(payload) for payload in payloads]
+    valid = [i for i, error in enumerate(errors) if error is None]
+    results = [({"error": error}, 400) for error in errors]
+    scores = sentiment_batch.score_many([payloads[i]['entry'] for i in valid], sentiment_engine)
+    try:
+        bodies = record_journal_entries([payloads[i] for i in valid], scores.tolist())
+    except OSError:
+        bodies = [None] * len(valid)
+    for i, body in zip(valid, bodies):
+        if body is None:
+            results[i] = ({"error": "The journal entry could not be saved. Please try again."}, 503)
+        else:
+            results[i] = (body, 200)
+    return results
+
+def _batch_recommend_habit(models, payloads):
+    # Complete questionnaires are answered with one table gather
+    complete = [i for i, payload in enumerate(payloads) if all(key in payload for key in FEATURES)]
+    results = [({'error': 'Invalid input. All fields are required.'}, 400)] * len(payloads)
+    for i, habit in zip(complete, lookup_habits(models['habit_lookup'], [payloads[i] for i in complete])):
+        if isinstance(habit, ValueError):
+            results[i] = ({"error": f"Invalid input value: {str(habit)}"}, 400)
+        else:
+            results[i] = ({'recommended_habit': habit}, 200)
+    return results
+
+def _batch_music_recommendation(models, payloads):
+    return [music_page(models['music_catalog'], payload) for payload in payloads]
+
+def _batch_habit_clustering(models, payloads):
+    return [habit_plan(models['cluster_index'], payload) for payload in payloads]
+
+# Operations accepted by /batch; each takes the published models and every payload for its op,
+# and returns (body, status) pairs in order
+BATCH_OPERATIONS = {
+    "chatbot": _batch_chatbot,
+    "ai_writing_therapist": lambda models, payloads: [writing_prompt(payload) for payload in payloads],
+    "journal": _batch_journal,
+    "recommend_habit": _batch_recommend_habit,
+    "music_recommendation": _batch_music_recommendation,
+    "habit_clustering": _batch_habit_clustering
+}
+
+def run_operation(op, models, payloads):
+    """(body, status) per payload from BATCH_OPERATIONS[op].
+
+    If the handler raises for the group, each payload is retried on its own, so the error
+    only becomes a 500 entry for the items that cause it.
+    """
+    handler = BATCH_OPERATIONS[op]
+    try:
+        return handler(models, payloads)
+    except Exception:
+        if len(payloads) == 1:
+            logging.exception(f"Batch {op} item failed")
+            return [({"error": "Internal error while processing this request."}, 500)]
+        logging.exception(f"Batch {op} failed; retrying its {len(payloads)} items one by one")
+    outcomes = []
+    for payload in payloads:
+        outcomes.extend(run_operation(op, models, [payload]))
+    return outcomes
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Run many sub-requests in one call, grouped by operation."""
+    data = request.json
+    items = data.get('requests') if isinstance(data, dict) else None
+
+    if not isinstance(items, list):
+        return jsonify({'error': 'Invalid input. Expected a list of requests.'}), 400
+    if len(items) > MAX_BATCH_REQUESTS:
+        return jsonify({'error': f'Too many requests. The limit is {MAX_BATCH_REQUESTS}.'}), 413
+
+    models = registry.current()
+    results = [None] * len(items)
+    groups = {}
+    for i, item in enumerate(items):
+        op = item.get('op') if isinstance(item, dict) else None
+        payload = item.get('payload', {}) if isinstance(item, dict) else None
+        if not isinstance(op, str) or op not in BATCH_OPERATIONS:
+            results[i] = ({"error": f"Unknown op: {op!r}"}, 400)
+        elif not isinstance(payload, dict):
+            results[i] = ({"error": "Invalid payload. Expected an object."}, 400)
+        else:
+            groups.setdefault(op, []).append((i, payload))
+
+    for op, entries in groups.items():
+        with metrics.stage(f'batch_{op}'):
+            outcomes = run_operation(op, models, [payload for _, payload in entries])
+        for (i, _), outcome in zip(entries, outcomes):
+            results[i] = outcome
+
+    # Music pages arrive pre-encoded, so the response is assembled as text
+    encoded = []
+    for body, status in results:
+        body = body if isinstance(body, str) else app.json.dumps(body)
+        encoded.append(f'{{"status": {status}, "body": {body}}}')
+
+    g.log_fields['batch_size'] = len(items)
+    g.log_fields['batch_ops'] = sorted(groups)
+    return app.response_class('{"results": [' + ','.join(encoded) + ']}', mimetype='application/json')
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Latency histograms per endpoint and per stage, in Prometheus text format."""
+    extra = {}
+    log_stats = request_log.stats()
+    if log_stats is not None:
+        extra['serene_log_records_dropped_total'] = ("Log records dropped because the buffer was full.", log_stats['dropped'])
+    registry_stats = registry.stats()
+    extra['serene_model_reloads_total'] = ("Models and catalogs rebuilt after a data change.", registry_stats['reloads'])
+    extra['serene_model_reload_failures_total'] = ("Rebuilds rejected by validation or errors.", registry_stats['failures'])
+    session_stats = sessions.stats()
+    extra['serene_chat_sessions_expired_total'] = ("Chat sessions dropped after their TTL.", session_stats['expired'])
+    extra['serene_chat_sessions_evicted_total'] = ("Chat sessions evicted to stay under the memory cap.", session_stats['evicted'])
+    if journal is not None:
+        journal_stats = journal.stats()
+        extra['serene_journal_entries_written_total'] = ("Journal entries committed by this process.", journal_stats['written'])
+        extra['serene_journal_commits_total'] = ("Group commits (one write and fsync each) by this process.", journal_stats['commits'])
+    cache_stats = responses.stats()
+    extra['serene_response_cache_hits_total'] = ("Responses served from the response cache.", cache_stats['hits'])
+    extra['serene_response_cache_misses_total'] = ("Cacheable responses that had to be built.", cache_stats['misses'])
+    extra['serene_response_cache_invalidations_total'] = ("Datasets whose cached responses were dropped after a reload.", cache_stats['invalidations'])
+    extra['serene_response_cache_entries'] = ("Responses in the response cache.", cache_stats['entries'], 'gauge')
+    if scheduler is not None:
+        scheduler_stats = scheduler.stats()
+        extra['serene_sentiment_queue_depth'] = ("Texts waiting for a sentiment batch.", scheduler_stats['queue_depth'], 'gauge')
+        extra['serene_sentiment_batches_total'] = ("Sentiment batches scored by the worker pool.", scheduler_stats['batches'])
+        extra['serene_sentiment_batched_texts_total'] = ("Texts scored in batches.", scheduler_stats['items'])
+        extra['serene_sentiment_inline_texts_total'] = ("Texts scored directly because nothing was queued.", scheduler_stats['inline'])
+        extra['serene_sentiment_largest_batch'] = ("Largest sentiment batch so far.", scheduler_stats['largest_batch'], 'gauge')
+        extra['serene_sentiment_batch_window_seconds'] = ("Current batching window.", scheduler_stats['window_seconds'], 'gauge')
+    return app.response_class(metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 200 once warm_up() has built every model and catalog."""
+    if not ready:
+        return jsonify({"status": "warming up"}), 503
+    return jsonify({"status": "ready"})
+
+def warm_up():
+    """Build every lazily created cache so the first requests do not pay for it."""
+    global ready
+    catalog = registry.get('music_catalog')
+    for mood in catalog['moods']:
+        music_catalog.get_page(catalog, mood, 0, 1)
+    sentiment_analyzer.polarity_scores("warm up")
+    ready = True
 
 def convert_to_native(data):
     """Convert numpy and pandas data types to native Python types."""
@@ -252,6 +656,7 @@ def convert_to_native(data):
         return [convert_to_native(item) for item in data]  # Convert items in a list
     return data  # Return data as-is if no conversion is needed
 
-# Start the app
+# Start the development server (use gunicorn.conf.py in production)
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True)
@@ -0,0 +1,224 @@
+# audio_features.py
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Decoding is delegated to ffmpeg, which must be on PATH (or set FFMPEG_BINARY)
+FFMPEG = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+# Directory holding features.npy and index.json
+FEATURE_STORE_DIR = os.environ.get('MUSIC_FEATURE_STORE', 'music_features')
+
+SAMPLE_RATE = 22050
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+
+# Frames analysed per FFT block, which bounds memory for long tracks
+BLOCK_FRAMES = 1024
+
+FEATURE_NAMES = ['energy', 'tempo', 'spectral_centroid', 'spectral_rolloff', 'zero_crossing_rate']
+
+def decode(path, sample_rate=SAMPLE_RATE):
+    """Decode an audio file to mono float32 samples."""
+    result = subprocess.run(
+        [FFMPEG, '-v', 'error', '-i', path, '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), '-'],
+        capture_output=True, check=True
+    )
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def _estimate_tempo(flux, sample_rate):
+    # Autocorrelation of the onset envelope, searched between 60 and 200 BPM
+    envelope = flux - flux.mean()
+    frames_per_second = sample_rate / HOP_SIZE
+    min_lag = int(frames_per_second * 60 / 200)
+    max_lag = int(frames_per_second * 60 / 60)
+    if len(envelope) <= max_lag:
+        return 0.0
+    size = 1 << int(np.ceil(np.log2(2 * len(envelope))))
+    spectrum = np.fft.rfft(envelope, size)
+    correlation = np.fft.irfft(spectrum * np.conj(spectrum), size)[:max_lag + 1]
+    lag = min_lag + int(np.argmax(correlation[min_lag:max_lag + 1]))
+    return 60.0 * frames_per_second / lag
+
+def describe(samples, sample_rate=SAMPLE_RATE):
+    """Compute FEATURE_NAMES for mono samples."""
+    if len(samples) < FRAME_SIZE:
+        samples = np.pad(samples, (0, FRAME_SIZE - len(samples)))
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    frequencies = np.fft.rfftfreq(FRAME_SIZE, 1.0 / sample_rate)
+
+    energy, centroid, rolloff, crossings, flux = [], [], [], [], []
+    previous = None
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        block = frames[start:start + BLOCK_FRAMES]
+        magnitude = np.abs(np.fft.rfft(block * window, axis=1))
+        total = magnitude.sum(axis=1)
+        safe_total = np.where(total > 0, total, 1.0)
+
+        energy.append(np.sqrt(np.mean(block ** 2, axis=1)))
+        centroid.append(magnitude @ frequencies / safe_total)
+        cumulative = np.cumsum(magnitude, axis=1)
+        rolloff.append(frequencies[np.argmax(cumulative >= 0.85 * cumulative[:, -1:], axis=1)])
+        crossings.append(np.mean(np.signbit(block[:, 1:]) != np.signbit(block[:, :-1]), axis=1))
+
+        # Positive spectral flux, carried across block boundaries
+        stacked = magnitude if previous is None else np.vstack([previous, magnitude])
+        step = np.maximum(np.diff(stacked, axis=0), 0).sum(axis=1)
+        flux.append(step if previous is not None else np.r_[0.0, step])
+        previous = magnitude[-1:]
+
+    return np.array([
+        np.concatenate(energy).mean(),
+        _estimate_tempo(np.concatenate(flux), sample_rate),
+        np.concatenate(centroid).mean(),
+        np.concatenate(rolloff).mean(),
+        np.concatenate(crossings).mean()
+    ], dtype=np.float32)
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _process(path, known_digest):
+    # Runs in a worker: a file whose content is unchanged is not decoded again.
+    # Returns (digest, features or None, error or None); one bad file must not stop the build.
+    try:
+        digest = file_digest(path)
+        if digest == known_digest:
+            return digest, None, None
+        return digest, describe(decode(path)), None
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.decode('utf-8', 'replace').strip().splitlines()
+        return None, None, message[-1] if message else f"ffmpeg exited with status {e.returncode}"
+    except (OSError, ValueError) as e:
+        return None, None, str(e)
+
+def _load_index(store_dir):
+    try:
+        with open(os.path.join(store_dir, 'index.json'), encoding='utf-8') as file:
+            index = json.load(file)
+        matrix = np.load(os.path.join(store_dir, 'features.npy'))
+    except FileNotFoundError:
+        return {}, None
+    if index.get('features') != FEATURE_NAMES:
+        return {}, None
+    return index['files'], matrix
+
+def _write_atomic(path, write):
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        write(file)
+    os.replace(temporary, path)
+
+def build_feature_store(music_dir, store_dir=FEATURE_STORE_DIR, workers=None):
+    """Extract features for every MP3 in music_dir, re-processing only new or changed files.
+
+    Files that cannot be read or decoded are left out of the store (and retried on the next
+    build); they are listed with their error under 'failed' in the returned summary.
+    """
+    files, matrix = _load_index(store_dir)
+    names = sorted(name for name in os.listdir(music_dir) if name.lower().endswith('.mp3'))
+
+    rows, pending = {}, []
+    for name in names:
+        stat = os.stat(os.path.join(music_dir, name))
+        entry = files.get(name)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            rows[name] = (entry, matrix[entry['row']])
+        else:
+            pending.append((name, stat, entry))
+
+    if pending and shutil.which(FFMPEG) is None:
+        raise RuntimeError(f"{FFMPEG} was not found on PATH; install ffmpeg or set FFMPEG_BINARY")
+
+    paths = [os.path.join(music_dir, name) for name, _, _ in pending]
+    known = [entry['sha256'] if entry else None for _, _, entry in pending]
+    processed = 0
+    failed = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (name, stat, entry), (digest, features, error) in zip(pending, pool.map(_process, paths, known)):
+            if error is not None:
+                failed[name] = error
+                continue
+            if features is None:
+                features = matrix[entry['row']]
+            else:
+                processed += 1
+            rows[name] = ({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}, features)
+
+    # Rows follow file name order; files that disappeared or failed are dropped
+    names = [name for name in names if name in rows]
+    new_files, new_matrix = {}, np.zeros((len(names), len(FEATURE_NAMES)), dtype=np.float32)
+    for row, name in enumerate(names):
+        entry, features = rows[name]
+        new_files[name] = dict(entry, row=row)
+        new_matrix[row] = features
+
+    os.makedirs(store_dir, exist_ok=True)
+    _write_atomic(os.path.join(store_dir, 'features.npy'), lambda file: np.save(file, new_matrix))
+    _write_atomic(
+        os.path.join(store_dir, 'index.json'),
+        lambda file: file.write(json.dumps({"features": FEATURE_NAMES, "files": new_files}).encode('utf-8'))
+    )
+    return {"files": len(names), "processed": processed, "reused": len(names) - processed, "failed": failed}
+
+def load_feature_store(store_dir=FEATURE_STORE_DIR):
+    """Memory-map a feature store, or return None if it has not been built."""
+    files, _ = _load_index(store_dir)
+    if not files:
+        return None
+    matrix = np.load(os.path.join(store_dir, 'features.npy'), mmap_mode='r')
+
+    # Descriptors live on very different scales, so they are standardized before cosine similarity
+    std = matrix.std(axis=0)
+    return {
+        "rows": {name: entry['row'] for name, entry in files.items()},
+        "matrix": matrix,
+        "mean": matrix.mean(axis=0),
+        "std": np.where(std > 0, std, 1.0)
+    }
+
+def with_store_features(data, store):
+    """Replace the featureN columns of a catalog frame with standardized descriptors from store.
+
+    Tracks whose file is not in the store get all-zero features.
+    """
+    data = data.drop(columns=[column for column in data.columns if column.startswith('feature')])
+    # Catalog paths may be Windows paths, so tracks are matched on file name
+    names = data['file_path'].astype(str).str.replace('\\', '/', regex=False).str.rsplit('/', n=1).str[-1]
+    rows = names.map(store['rows']).fillna(-1).astype(np.int64).to_numpy()
+
+    features = np.zeros((len(data), len(FEATURE_NAMES)), dtype=np.float32)
+    known = rows >= 0
+    features[known] = (store['matrix'][rows[known]] - store['mean']) / store['std']
+    for column in range(len(FEATURE_NAMES)):
+        data[f'feature{column + 1}'] = features[:, column]
+    return data
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extract audio features for a directory of MP3 files.")
+    parser.add_argument('music_dir', nargs='?', default='.')
+    parser.add_argument('store_dir', nargs='?', default=FEATURE_STORE_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        summary = build_feature_store(args.music_dir, args.store_dir, args.workers)
+    except RuntimeError as e:
+        parser.error(str(e))
+    for name, error in summary['failed'].items():
+        print(f"Skipped {name}: {error}")
+    print(f"{summary['files']} files: {summary['processed']} processed, {summary['reused']} reused, "
+          f"{len(summary['failed'])} failed in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,69 @@
+# benchmarks/generate_data.py
+# Synthetic, seeded versions of the app's CSV files at any size.
+# Usage: python benchmarks/generate_data.py <output dir> [rows]
+import csv
+import os
+import random
+import sys
+
+EXERCISE = ['Daily', 'A few times a week', 'Rarely', 'Never']
+SOCIAL_MEDIA = ['Less than 1 hour', '1-2 hours', '2-3 hours', 'More than 3 hours']
+STRESS = ['Low', 'Moderate', 'High']
+MINDFULNESS = ['Daily', 'A few times a week', 'Rarely', 'Never']
+HABITS = ['Exercise for 30 minutes', 'Practice mindfulness for 10 minutes', 'Go for a nature walk',
+          'Try a new hobby', 'Practice gratitude journaling', 'Schedule a digital detox day']
+MOODS = ['fun', 'relaxation', 'motivation']
+
+# Files shipped with the repo; generated tracks point at them so streaming can be exercised
+MP3_FILES = ['calm-acoustic-quiet-quest-251658.mp3', 'fun-day-150602.mp3', 'fun-piano-bgm-242448.mp3',
+             'happy-rock-165132.mp3', 'inspiring-motivation-music-250532.mp3']
+
+def _write(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def generate_habit_survey(path, rows, rng):
+    # Same columns as habit_data.csv; the label depends on the answers so the tree has structure to learn
+    def row():
+        answers = [rng.choice(EXERCISE), rng.choice(SOCIAL_MEDIA), rng.choice(STRESS), rng.choice(MINDFULNESS)]
+        label = HABITS[(EXERCISE.index(answers[0]) + STRESS.index(answers[2]) * 2) % len(HABITS)]
+        return answers + [label]
+    _write(path, ['exercise_frequency', 'social_media_hours', 'stress_level', 'mindfulness_frequency',
+                  'recommended_habit'], (row() for _ in range(rows)))
+
+def generate_habits(path, rows, rng):
+    # Three rough duration groups, like habits_data.csv
+    def row(i):
+        center = rng.choice([15, 45, 90])
+        return [f'Habit {i}', max(1, int(rng.gauss(center, center / 4)))]
+    _write(path, ['habit_name', 'time_needed'], (row(i) for i in range(rows)))
+
+def generate_music(path, rows, rng):
+    def row(i):
+        mood = rng.choice(MOODS)
+        features = [round(rng.random(), 4) for _ in range(3)]
+        return [f'track-{i}', f'D:\\ML_files\\{rng.choice(MP3_FILES)}', mood] + features
+    _write(path, ['title', 'file_path', 'mood', 'feature1', 'feature2', 'feature3'], (row(i) for i in range(rows)))
+
+def generate_responses(path, rows, rng):
+    def row(i):
+        sentiment = rng.choice(['Positive', 'Neutral', 'Negative'])
+        return [sentiment, f'{sentiment} response number {i}.']
+    _write(path, ['Sentiment', 'Response'], (row(i) for i in range(rows)))
+
+def generate_all(directory, rows, seed=42):
+    """Write habit_data.csv, habits_data.csv, music_data.csv and responses.csv with `rows` rows each."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    generate_habit_survey(os.path.join(directory, 'habit_data.csv'), rows, rng)
+    generate_habits(os.path.join(directory, 'habits_data.csv'), rows, rng)
+    generate_music(os.path.join(directory, 'music_data.csv'), rows, rng)
+    generate_responses(os.path.join(directory, 'responses.csv'), rows, rng)
+
+if __name__ == '__main__':
+    target = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    generate_all(target, count)
+    print(f"Wrote {count} rows per file to {target}")
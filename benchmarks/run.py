@@ -0,0 +1,246 @@
+# benchmarks/run.py
+# Microbenchmarks and a concurrent load test of every Flask route, on synthetic data of any size.
+# Usage: python benchmarks/run.py [--rows 10000] [--output results.json]
+#        python benchmarks/run.py --compare baseline.json results.json
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generate_data import EXERCISE, MINDFULNESS, MOODS, SOCIAL_MEDIA, STRESS, generate_all
+
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results.json')
+
+# Upper limit on the time spent repeating a single microbenchmark
+MICRO_TIME_BUDGET = 10.0
+
+MESSAGES = ["I feel great today!", "Not sure how I feel about this week.", "I'm really stressed and tired.",
+            "Work was fine, nothing special.", "I can't stop worrying about everything."]
+
+def _percentile(ordered, fraction):
+    # Nearest-rank percentile of an already sorted list
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def _summary(durations):
+    ordered = sorted(durations)
+    return {
+        "runs": len(ordered),
+        "median_ms": round(statistics.median(ordered) * 1000, 4),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 4),
+        "min_ms": round(ordered[0] * 1000, 4)
+    }
+
+def _questionnaire(rng):
+    return {
+        "exercise_frequency": rng.choice(EXERCISE),
+        "social_media_hours": rng.choice(SOCIAL_MEDIA),
+        "stress_level": rng.choice(STRESS),
+        "mindfulness_frequency": rng.choice(MINDFULNESS)
+    }
+
+def measure(func, repeat):
+    """Call func up to `repeat` times (at least once, within MICRO_TIME_BUDGET) and summarize."""
+    durations = []
+    deadline = time.perf_counter() + MICRO_TIME_BUDGET
+    while len(durations) < repeat and (not durations or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return _summary(durations)
+
+def run_micro(repeat):
+    import chatbot
+    import habit_clustering
+    import habit_recommendation
+    import music_similarity
+    import pandas as pd
+
+    rng = random.Random(1)
+    habits = habit_clustering.load_data(habit_clustering.HABITS_FILE)
+    clustered = habit_clustering.preprocess_and_cluster(habits.copy())
+    music = pd.read_csv('music_data.csv')
+    index = music_similarity.build_index(music)
+    habit_recommendation.get_habit_lookup()
+
+    benchmarks = {
+        "recommend_habits": (lambda: habit_clustering.recommend_habits(clustered, rng.randint(10, 240)), min(repeat, 5)),
+        "preprocess_and_cluster": (lambda: habit_clustering.preprocess_and_cluster(habits.copy()), min(repeat, 5)),
+        "music_similarity.build_index": (lambda: music_similarity.build_index(music), min(repeat, 5)),
+        "music_similarity.recommend": (lambda: music_similarity.recommend(index, rng.choice(MOODS)), repeat),
+        "analyze_sentiment": (lambda: chatbot.analyze_sentiment(rng.choice(MESSAGES)), repeat),
+        "analyze_sentiments_x1000": (lambda: chatbot.analyze_sentiments([rng.choice(MESSAGES) for _ in range(1000)]),
+                                     min(repeat, 20)),
+        "recommend_habit": (lambda: habit_recommendation.recommend_habit(*_questionnaire(rng).values()), repeat)
+    }
+
+    # music_therapy needs pygame for playback; without it the engine above is still measured
+    try:
+        import music_therapy
+        benchmarks["get_recommendations"] = (lambda: music_therapy.get_recommendations(rng.choice(MOODS)), repeat)
+    except ImportError as e:
+        print(f"Skipping get_recommendations: {e}")
+
+    results = {}
+    for name, (func, runs) in benchmarks.items():
+        results[name] = measure(func, runs)
+        print(f"{name:>30}: median {results[name]['median_ms']:10.4f} ms  p95 {results[name]['p95_ms']:10.4f} ms")
+    return results
+
+def route_requests(rows, rng):
+    """(name, method, path, kwargs factory) for every route, with realistic payloads."""
+    return [
+        ("chatbot", 'POST', '/chatbot', lambda: {"json": {"input": rng.choice(MESSAGES)}}),
+        ("ai_writing_therapist", 'POST', '/ai_writing_therapist',
+         lambda: {"json": {"mood": rng.choice(['good', 'neutral', 'bad'])}}),
+        ("journal", 'POST', '/journal', lambda: {"json": {"user_id": f"user-{rng.randrange(100)}",
+                                                          "entry": rng.choice(MESSAGES)}}),
+        ("recommend_habit", 'POST', '/recommend_habit', lambda: {"json": _questionnaire(rng)}),
+        ("recommend_habit_batch", 'POST', '/recommend_habit/batch',
+         lambda: {"json": {"questionnaires": [_questionnaire(rng) for _ in range(100)]}}),
+        ("music_recommendation", 'POST', '/music_recommendation',
+         lambda: {"json": {"mood": rng.choice(MOODS), "limit": 100}}),
+        # Players open a stream with a range request for the first chunk
+        ("stream_track", 'GET', lambda: f'/tracks/{rng.randrange(rows)}/stream',
+         lambda: {"headers": {"Range": "bytes=0-262143"}}),
+        ("habit_clustering", 'POST', '/habit_clustering', lambda: {"json": {"time_available": rng.randint(10, 240)}}),
+        ("batch", 'POST', '/batch', lambda: {"json": {"requests": [
+            {"op": "chatbot", "payload": {"input": rng.choice(MESSAGES)}},
+            {"op": "ai_writing_therapist", "payload": {"mood": "good"}},
+            {"op": "recommend_habit", "payload": _questionnaire(rng)},
+            {"op": "music_recommendation", "payload": {"mood": rng.choice(MOODS), "limit": 10}},
+            {"op": "habit_clustering", "payload": {"time_available": rng.randint(10, 240)}}
+        ]}}),
+        ("metrics", 'GET', '/metrics', lambda: {}),
+        ("ready", 'GET', '/ready', lambda: {})
+    ]
+
+def run_load(rows, requests, concurrency):
+    import app
+
+    app.warm_up()
+    rng = random.Random(2)
+    local = threading.local()
+
+    def call(method, path, kwargs):
+        # The test client keeps per-client state, so each worker thread gets its own
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.app.test_client()
+        started = time.perf_counter()
+        response = client.open(path() if callable(path) else path, method=method, **kwargs)
+        response.get_data()
+        response.close()
+        return time.perf_counter() - started, response.status_code
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for name, method, path, make_kwargs in route_requests(rows, rng):
+            jobs = [(method, path, make_kwargs()) for _ in range(requests)]
+            started = time.perf_counter()
+            outcomes = list(pool.map(lambda job: call(*job), jobs))
+            elapsed = time.perf_counter() - started
+
+            ordered = sorted(duration for duration, _ in outcomes)
+            results[name] = {
+                "requests": requests,
+                "errors": sum(1 for _, status in outcomes if status >= 400),
+                "throughput_rps": round(requests / elapsed, 1),
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 4),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 4),
+                "p99_ms": round(_percentile(ordered, 0.99) * 1000, 4)
+            }
+            result = results[name]
+            print(f"{name:>22}: {result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:8.3f} ms  "
+                  f"p95 {result['p95_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms  errors {result['errors']}")
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline_path, current_path, threshold):
+    """Print the change of every shared measurement; returns the number of regressions beyond threshold."""
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = json.load(file)
+    with open(current_path, encoding='utf-8') as file:
+        current = json.load(file)
+
+    # (section, metric, True if higher is better)
+    checks = [("micro", "median_ms", False), ("routes", "p95_ms", False), ("routes", "throughput_rps", True)]
+    regressions = 0
+    for section, metric, higher_is_better in checks:
+        for name in sorted(set(baseline.get(section, {})) & set(current.get(section, {}))):
+            before, after = baseline[section][name][metric], current[section][name][metric]
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > threshold else ""
+            regressions += bool(flag)
+            print(f"{section:>6} {name:>30} {metric:>15}: {before:12.4f} -> {after:12.4f} ({change:+7.1%}) {flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Serene on synthetic data.")
+    parser.add_argument('--rows', type=int, default=10000, help="rows in each generated CSV")
+    parser.add_argument('--data', help="directory for the generated CSVs (kept, and reused if present)")
+    parser.add_argument('--repeat', type=int, default=200, help="calls per microbenchmark")
+    parser.add_argument('--requests', type=int, default=500, help="requests per route")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent client threads")
+    parser.add_argument('--skip', choices=['micro', 'load'], action='append', default=[])
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'))
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    output = os.path.abspath(args.output)
+    directory = os.path.abspath(args.data) if args.data else tempfile.mkdtemp(prefix='serene-bench-')
+    if not os.path.exists(os.path.join(directory, 'responses.csv')):
+        started = time.perf_counter()
+        generate_all(directory, args.rows)
+        print(f"Generated {args.rows} rows per file in {directory} ({time.perf_counter() - started:.1f}s)")
+
+    # The modules read their CSVs from the working directory; tracks stream from the bundled MP3s
+    os.chdir(directory)
+    os.environ['SERENE_SNAPSHOT'] = ''
+    os.environ.setdefault('MUSIC_DIR', ROOT)
+
+    results = {
+        "meta": {
+            "rows": args.rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        }
+    }
+    if 'micro' not in args.skip:
+        results['micro'] = run_micro(args.repeat)
+    if 'load' not in args.skip:
+        results['routes'] = run_load(args.rows, args.requests, args.concurrency)
+
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"Saved results to {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/sentiment_equivalence.py
+# Check sentiment_batch.score_many against VADER's polarity_scores on a reference corpus, and time both.
+# Usage: python benchmarks/sentiment_equivalence.py [generated texts] [tolerance]
+import csv
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sentiment_batch
+from vaderSentiment.vaderSentiment import BOOSTER_DICT, NEGATE, SPECIAL_CASES
+
+# Hand-picked cases for each rule: negation, 'no', boosters, ALL CAPS, 'but', 'least', idioms, emoji, punctuation
+CASES = [
+    "", "   ", "VADER is smart, handsome, and funny.", "VADER is smart, handsome, and funny!",
+    "VADER is very smart, handsome, and funny.", "VADER is VERY SMART, handsome, and FUNNY.",
+    "VADER is VERY SMART, handsome, and FUNNY!!!", "VADER is not smart, handsome, nor funny.",
+    "The book was good.", "At least it isn't a horrible book.", "The book was only kind of good.",
+    "The plot was good, but the characters are uncompelling and the dialog is not great.",
+    "Today SUX!", "Today only kinda sux! But I'll get by, lol", "Make sure you :) or :D today!",
+    "Catch utf-8 emoji such as 💘 and 💋 and 😁", "Not bad at all", "no problem", "no no no good",
+    "I have no doubt or fear", "never so happy", "without doubt the best", "the least bad option",
+    "at least good", "very least good", "This is the bomb!!", "Yeah right, great job???",
+    "I can't stand it", "It's not the worst, but it is not good either", "good good but good good",
+    "That’s wonderful! I’m glad to hear that!", "😀😀😀", "HAPPY happy HAPPY", "GREAT", "great great"
+]
+
+def generated(count, seed=0):
+    """Random word salads biased towards the words VADER's rules look at."""
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    lexicon = list(SentimentIntensityAnalyzer().lexicon)
+    pool = (lexicon[::5] + list(BOOSTER_DICT) + NEGATE + [word for key in SPECIAL_CASES for word in key.split()] +
+            ['no', 'but', 'least', 'at', 'very', 'never', 'so', 'this', 'without', 'or', 'nor', 'kind', 'of',
+             ':)', ':(', '😀', '😢', 'the', 'house', 'today', "isn't"])
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(pool) for _ in range(rng.randint(1, 20))]
+        words = [word.upper() if rng.random() < 0.15 else word for word in words]
+        text = ' '.join(words)
+        if rng.random() < 0.3:
+            text += rng.choice(['!', '!!', '?', '??', '???', '?????', '!!!!!!', '.', '...'])
+        texts.append(text)
+    return texts
+
+def corpus(count):
+    texts = list(CASES)
+    responses = os.path.join(ROOT, 'responses.csv')
+    with open(responses, encoding='utf-8') as file:
+        texts += [row['Response'] for row in csv.DictReader(file)]
+    return texts + generated(count)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tolerance = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0001
+    texts = corpus(count)
+    engine = sentiment_batch.get_engine()
+    analyzer = engine['analyzer']
+
+    started = time.perf_counter()
+    expected = np.array([analyzer.polarity_scores(text)['compound'] for text in texts])
+    reference_time = time.perf_counter() - started
+
+    sentiment_batch.score_many(texts[:100], engine)  # Fill the token cache for a fair timing
+    started = time.perf_counter()
+    scores = sentiment_batch.score_many(texts, engine)
+    batch_time = time.perf_counter() - started
+
+    difference = np.abs(scores - expected)
+    mismatched = np.flatnonzero(difference > tolerance)
+    print(f"{len(texts)} texts: polarity_scores {reference_time:.2f}s, score_many {batch_time:.2f}s "
+          f"({reference_time / batch_time:.1f}x)")
+    print(f"max difference {difference.max():.6f}, exact matches {int((difference == 0).sum())}/{len(texts)}")
+    for i in mismatched[:20]:
+        print(f"MISMATCH {texts[i]!r}: expected {expected[i]}, got {scores[i]}")
+    sys.exit(1 if len(mismatched) else 0)
+
+if __name__ == '__main__':
+    main()
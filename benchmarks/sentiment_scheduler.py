@@ -0,0 +1,69 @@
+# benchmarks/sentiment_scheduler.py
+# Compare scoring in request threads with the micro-batching scheduler, at low and high concurrency.
+# Usage: python benchmarks/sentiment_scheduler.py [requests per thread] [threads] [repeats]
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sentiment_batch
+import sentiment_scheduler
+from benchmarks.sentiment_equivalence import generated
+
+def run(score, texts, threads):
+    """Call score(text) from `threads` threads; returns (throughput, p50 ms, p99 ms, CPU µs per text, scores by text index)."""
+    latencies = []
+    scores = {}
+    chunks = [list(range(i, len(texts), threads)) for i in range(threads)]
+
+    def worker(indexes):
+        for i in indexes:
+            started = time.perf_counter()
+            scores[i] = score(texts[i])
+            latencies.append(time.perf_counter() - started)
+
+    started, cpu = time.perf_counter(), time.process_time()
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu
+
+    ordered = sorted(latencies)
+    return (len(texts) / elapsed, statistics.median(ordered) * 1000,
+            ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000, cpu / len(texts) * 1e6, scores)
+
+def main():
+    per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    # Timings on a shared machine vary from run to run; each setup reports its best run
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    engine = sentiment_batch.get_engine()
+    analyzer = engine['analyzer']
+    expected = None
+
+    for threads in (1, concurrency):
+        texts = generated(per_thread * threads, seed=threads)
+        reference = [analyzer.polarity_scores(text)['compound'] for text in texts]
+        setups = [("off", None)] + [(mode, sentiment_scheduler.SentimentScheduler(engine, mode))
+                                    for mode in ('thread', 'process')]
+        for name, scheduler in setups:
+            score = (lambda text: analyzer.polarity_scores(text)['compound']) if scheduler is None else scheduler.score
+            if scheduler is not None:
+                run(score, texts[:200], threads)  # Start the pool before timing
+            throughput, p50, p99, cpu, scores = max(run(score, texts, threads) for _ in range(repeats))
+            expected = [scores[i] for i in range(len(texts))] == reference
+            line = f"{threads:>3} threads, {name:>7}: {throughput:9.0f} texts/s  p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  CPU {cpu:5.1f} µs/text"
+            if scheduler is not None:
+                stats = scheduler.stats()
+                line += f"  mean batch {stats['mean_batch_size']:6.1f}  largest {stats['largest_batch']:4}  inline {stats['inline']}"
+                scheduler.close()
+            print(line + ("" if expected else "  MISMATCH"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+# benchmarks/startup.py
+# Compare a cold import of app.py (training and CSV parsing) with a snapshot-backed import.
+# Usage: python benchmarks/startup.py [runs]
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each run is a fresh interpreter, so nothing is cached between measurements
+PROBE = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+
+def time_import(snapshot_path, runs):
+    env = dict(os.environ, SERENE_SNAPSHOT=snapshot_path)
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    snapshot_path = os.path.join(ROOT, 'serene_snapshot.pkl')
+    subprocess.run([sys.executable, 'snapshot.py', snapshot_path], cwd=ROOT, check=True)
+
+    for label, path in (("cold import", ''), ("snapshot load", snapshot_path)):
+        timings = time_import(path, runs)
+        print(f"{label:>14}: median {statistics.median(timings) * 1000:7.1f} ms "
+              f"(min {min(timings) * 1000:.1f}, max {max(timings) * 1000:.1f}, {runs} runs)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+# bulk_score.py
+# Run the models over a recorded request log: python bulk_score.py requests.jsonl results.jsonl [--workers 8]
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# app starts its server machinery at import: pin the models for the whole run (no reload watcher),
+# skip the journal and the log writer thread, and score sentiment in the calling process
+os.environ['SERENE_RELOAD_INTERVAL'] = '0'
+os.environ['SERENE_JOURNAL_DIR'] = ''
+os.environ['SERENE_LOG_MODE'] = 'sync'
+os.environ['SERENE_SENTIMENT_BATCHING'] = 'off'
+
+import app
+from habit_recommendation import FEATURES
+
+# Input lines handed to a worker at a time
+CHUNK_LINES = 2000
+
+# Seconds between checkpoints and between progress reports
+CHECKPOINT_INTERVAL = 10.0
+REPORT_INTERVAL = 5.0
+
+# Operations of app.BATCH_OPERATIONS that only read the models; /journal entries are not replayed
+OPERATIONS = ('chatbot', 'ai_writing_therapist', 'recommend_habit', 'habit_clustering', 'music_recommendation')
+
+def infer_op(record):
+    """The op of an input line: its 'op' field, or the one a bare payload's fields belong to."""
+    if 'op' in record:
+        return record['op']
+    if 'input' in record:
+        return 'chatbot'
+    if any(feature in record for feature in FEATURES):
+        return 'recommend_habit'
+    if 'time_available' in record:
+        return 'habit_clustering'
+    if 'mood' in record:
+        return 'music_recommendation'
+    return None
+
+def process_chunk(first_line, lines, seed=0):
+    """Return (JSONL results, error count) for raw input lines numbered from first_line.
+
+    Lines are grouped by op as in /batch, so chat messages are scored in one vectorized call
+    and questionnaires answered with one table gather.
+    """
+    # Replies are picked at random; seeding by chunk makes a resumed run write the same lines
+    random.seed(seed * 1000003 + first_line)
+    models = app.registry.current()
+    results = [None] * len(lines)
+    heads = [None] * len(lines)
+    groups = {}
+    for i, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            heads[i] = {"line": first_line + i, "op": None}
+            results[i] = ({"error": "Invalid JSON object."}, 400)
+            continue
+
+        op = infer_op(record)
+        payload = record.get('payload', {}) if 'op' in record else record
+        heads[i] = {"line": first_line + i, "op": op}
+        if 'id' in record:
+            heads[i]['id'] = record['id']
+        if op not in OPERATIONS:
+            results[i] = ({"error": f"Unknown op: {op!r}"}, 400)
+        elif not isinstance(payload, dict):
+            results[i] = ({"error": "Invalid payload. Expected an object."}, 400)
+        else:
+            if op == 'chatbot':
+                # Sessions live in one process, and lines of a conversation land in different workers
+                payload = {key: value for key, value in payload.items() if key != 'session_id'}
+            groups.setdefault(op, []).append((i, payload))
+
+    # A handler error becomes a status 500 line for the items causing it, so the run goes on
+    for op, entries in groups.items():
+        outcomes = app.run_operation(op, models, [payload for _, payload in entries])
+        for (i, _), outcome in zip(entries, outcomes):
+            results[i] = outcome
+
+    # Music pages arrive pre-encoded, so every line is assembled as text
+    output = []
+    errors = 0
+    for head, (body, status) in zip(heads, results):
+        head['status'] = status
+        errors += status >= 400
+        body = body if isinstance(body, str) else json.dumps(body)
+        output.append(f'{json.dumps(head)[:-1]}, "body": {body}}}\n')
+    return ''.join(output), errors
+
+def _read_chunks(file, chunk_lines):
+    # Yield (input offset after the chunk, non-blank lines) until the end of the file
+    while True:
+        lines = []
+        for line in iter(file.readline, b''):
+            if line.strip():
+                lines.append(line)
+                if len(lines) == chunk_lines:
+                    break
+        if not lines:
+            return
+        yield file.tell(), lines
+
+def load_checkpoint(path, input_path):
+    """The saved progress for path, or None; raises ValueError if it belongs to another input."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        return None
+    if checkpoint['input'] != os.path.abspath(input_path):
+        raise ValueError(f"{path} records a run over {checkpoint['input']}; use --restart to start over")
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file)
+    os.replace(temporary, path)
+
+def _report(checkpoint, lines, elapsed, input_bytes):
+    done = checkpoint['input_offset'] / input_bytes if input_bytes else 1.0
+    rate = lines / elapsed if elapsed else 0.0
+    print(f"{checkpoint['lines']} lines ({done:.1%}), {rate:,.0f} lines/s, {checkpoint['errors']} errors",
+          file=sys.stderr, flush=True)
+
+def run(input_path, output_path, workers=None, chunk_lines=CHUNK_LINES, restart=False, seed=0):
+    """Write one result line per input line to output_path, in input order; returns the final checkpoint.
+
+    At most two chunks per worker are in flight, so memory does not grow with the input.
+    Progress is saved to output_path + '.checkpoint' every CHECKPOINT_INTERVAL seconds (after
+    the output is fsynced), and a later run resumes from it unless restart is set.
+    """
+    workers = workers or os.cpu_count() or 1
+    checkpoint_path = output_path + '.checkpoint'
+    checkpoint = None if restart else load_checkpoint(checkpoint_path, input_path)
+    if checkpoint is None:
+        checkpoint = {"input": os.path.abspath(input_path), "input_offset": 0, "output_bytes": 0,
+                      "lines": 0, "errors": 0, "chunk_lines": chunk_lines, "seed": seed}
+    # A resumed run keeps the original chunking and seed, so it writes what the first run would have
+    chunk_lines, seed = checkpoint['chunk_lines'], checkpoint['seed']
+    input_bytes = os.path.getsize(input_path)
+
+    # Models are built once here; forked workers share them copy-on-write
+    app.warm_up()
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if fork else 'spawn')
+
+    started = last_report = last_checkpoint = time.perf_counter()
+    resumed_at = checkpoint['lines']
+    with open(input_path, 'rb') as source, open(output_path, 'ab') as output, \
+            ProcessPoolExecutor(workers, mp_context=context) as pool:
+        # Lines written after the last checkpoint are written again
+        output.truncate(checkpoint['output_bytes'])
+        source.seek(checkpoint['input_offset'])
+
+        chunks = _read_chunks(source, chunk_lines)
+        pending = deque()
+        next_line = checkpoint['lines'] + 1
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                offset, lines = chunk
+                pending.append((offset, len(lines), pool.submit(process_chunk, next_line, lines, seed)))
+                next_line += len(lines)
+            if not pending:
+                break
+
+            offset, count, future = pending.popleft()
+            text, errors = future.result()
+            output.write(text.encode('utf-8'))
+            checkpoint['input_offset'] = offset
+            checkpoint['lines'] += count
+            checkpoint['errors'] += errors
+
+            now = time.perf_counter()
+            if now - last_checkpoint >= CHECKPOINT_INTERVAL or not pending:
+                output.flush()
+                os.fsync(output.fileno())
+                checkpoint['output_bytes'] = output.tell()
+                save_checkpoint(checkpoint_path, checkpoint)
+                last_checkpoint = now
+            if now - last_report >= REPORT_INTERVAL:
+                _report(checkpoint, checkpoint['lines'] - resumed_at, now - started, input_bytes)
+                last_report = now
+
+    _report(checkpoint, checkpoint['lines'] - resumed_at, time.perf_counter() - started, input_bytes)
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the chatbot, habit and music models over a JSONL request log.")
+    parser.add_argument('input', help="JSONL with one /batch sub-request ({op, payload, id}) or bare payload per line")
+    parser.add_argument('output', help="JSONL with one {line, id, op, status, body} result per input line")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--chunk-lines', type=int, default=CHUNK_LINES)
+    parser.add_argument('--seed', type=int, default=0, help="seed for the chatbot's reply choice")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and start from the first line")
+    args = parser.parse_args()
+    try:
+        run(args.input, args.output, args.workers, args.chunk_lines, args.restart, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == '__main__':
+    main()
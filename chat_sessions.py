@@ -0,0 +1,140 @@
+# chat_sessions.py
+import math
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+# Recent compound scores kept per session
+SESSION_HISTORY = int(os.environ.get('SERENE_SESSION_HISTORY', 20))
+
+# Idle seconds before a session is forgotten
+SESSION_TTL = float(os.environ.get('SERENE_SESSION_TTL', 1800))
+
+# Hard cap on the memory used by all sessions of one process
+SESSION_MAX_BYTES = int(float(os.environ.get('SERENE_SESSION_MAX_MB', 256)) * 1024 * 1024)
+
+# Longest accepted session ID, so every session has a known worst-case size
+MAX_SESSION_ID_LENGTH = 128
+
+# Consecutive negative messages after which replies come from the support pool
+ESCALATE_AFTER = 3
+
+# Independently locked shards, so concurrent users rarely wait on each other
+SHARDS = 16
+
+# Reply pools, in the order their cycles are stored in Session.cycles
+POOLS = ('positive', 'neutral', 'negative', 'support')
+
+def classify(score):
+    """The chatbot's sentiment label for a compound score."""
+    if score >= 0.05:
+        return 'positive'
+    elif score <= -0.05:
+        return 'negative'
+    return 'neutral'
+
+class Session:
+    """Ring buffer of recent scores plus, per pool, the state of a no-repeat walk through its replies."""
+    __slots__ = ('scores', 'count', 'negative_streak', 'cycles', 'expires')
+
+    def __init__(self, history, expires):
+        self.scores = array('f', bytes(4 * history))
+        self.count = 0
+        self.negative_streak = 0
+        # Per pool: step, offset, position and pool size of the current walk
+        self.cycles = array('q', bytes(8 * 4 * len(POOLS)))
+        self.expires = expires
+
+    def add(self, score):
+        self.scores[self.count % len(self.scores)] = score
+        self.count += 1
+        self.negative_streak = self.negative_streak + 1 if score <= -0.05 else 0
+
+    def trend(self):
+        """Mean of the scores still in the ring buffer."""
+        kept = min(self.count, len(self.scores))
+        return sum(self.scores[:kept]) / kept if kept else 0.0
+
+    def next_reply(self, pool, size):
+        """Index of the next reply from a pool of `size` replies; none repeats until all have been used.
+
+        The walk visits offset, offset + step, offset + 2 * step, ... modulo size, with step
+        coprime to size, so it is a permutation that costs four integers instead of a list.
+        """
+        base = POOLS.index(pool) * 4
+        step, offset, position, known_size = self.cycles[base:base + 4]
+        if known_size != size or position >= size:
+            last = (offset + step * (position - 1)) % known_size if known_size and position else None
+            step = random.randrange(1, size) if size > 1 else 1
+            while math.gcd(step, size) != 1:
+                step = random.randrange(1, size)
+            offset = random.randrange(size)
+            if offset == last and size > 1:
+                offset = (offset + 1) % size  # Do not start the new walk with the reply that ended the last one
+            position = 0
+        self.cycles[base:base + 4] = array('q', (step, offset, position + 1, size))
+        return (offset + step * position) % size
+
+def _session_bytes(history):
+    # Worst-case footprint of one session, including its key and its slot in the shard's OrderedDict
+    sample = Session(history, 0.0)
+    key = sys.getsizeof('x' * MAX_SESSION_ID_LENGTH)
+    return sys.getsizeof(sample) + sys.getsizeof(sample.scores) + sys.getsizeof(sample.cycles) + key + 104
+
+class SessionStore:
+    """Sessions keyed by client-supplied ID, with TTL expiry and LRU eviction under a memory cap."""
+
+    def __init__(self, history=SESSION_HISTORY, ttl=SESSION_TTL, max_bytes=SESSION_MAX_BYTES, shards=SHARDS):
+        self.history = history
+        self.ttl = ttl
+        self.max_sessions = max(shards, max_bytes // _session_bytes(history))
+        self.evicted = 0
+        self.expired = 0
+        self._shard_limit = self.max_sessions // shards
+        self._shards = [(OrderedDict(), threading.Lock()) for _ in range(shards)]
+
+    def __len__(self):
+        return sum(len(sessions) for sessions, _ in self._shards)
+
+    def reply(self, session_id, score, pools):
+        """Record a message's score and choose the reply.
+
+        pools maps every name in POOLS to a list of replies. Returns (sentiment, reply,
+        escalated, mood trend).
+        """
+        sessions, lock = self._shards[hash(session_id) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            session = sessions.get(session_id)
+            if session is None or session.expires < now:
+                session = Session(self.history, 0.0)
+                sessions[session_id] = session
+            sessions.move_to_end(session_id)
+            session.expires = now + self.ttl
+            self._evict(sessions, now)
+
+            session.add(score)
+            sentiment = classify(score)
+            escalated = session.negative_streak >= ESCALATE_AFTER
+            pool = pools['support' if escalated else sentiment]
+            response = pool[session.next_reply('support' if escalated else sentiment, len(pool))]
+            return sentiment, response, escalated, session.trend()
+
+    def _evict(self, sessions, now):
+        # Least recently used first: expired sessions, then whatever exceeds the cap
+        while sessions:
+            session_id, session = next(iter(sessions.items()))
+            if session.expires < now:
+                self.expired += 1
+            elif len(sessions) > self._shard_limit:
+                self.evicted += 1
+            else:
+                return
+            del sessions[session_id]
+
+    def stats(self):
+        return {"sessions": len(self), "expired": self.expired, "evicted": self.evicted}
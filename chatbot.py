@@ -1,16 +1,22 @@
 # chatbot.py
 import logging
 import random
-import csv
+import time
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-# Configure logging
-logging.basicConfig(filename='app.log', level=logging.INFO, 
-                    format='%(asctime)s %(levelname)s: %(message)s')
+import data_cache
+import request_log
+import sentiment_batch
+
+# Configure logging (SERENE_LOG_MODE=queue writes structured events from a background thread)
+request_log.setup_logging('app.log')
 
 # Initialize the sentiment analyzer
 sentiment_analyzer = SentimentIntensityAnalyzer()
 
+# The same lexicon compiled for scoring many texts at once
+sentiment_engine = sentiment_batch.compile_engine(sentiment_analyzer)
+
 # Response pools for different sentiments
 positive_responses = []
 neutral_responses = []
@@ -18,15 +24,14 @@ negative_responses = []
 
 # Function to load responses from the CSV file
 def load_responses(filename):
-    with open(filename, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row['Sentiment'] == 'Positive':
-                positive_responses.append(row['Response'])
-            elif row['Sentiment'] == 'Neutral':
-                neutral_responses.append(row['Response'])
-            elif row['Sentiment'] == 'Negative':
-                negative_responses.append(row['Response'])
+    data = data_cache.load_csv(filename)
+    for sentiment, response in zip(data['Sentiment'].tolist(), data['Response'].tolist()):
+        if sentiment == 'Positive':
+            positive_responses.append(response)
+        elif sentiment == 'Neutral':
+            neutral_responses.append(response)
+        elif sentiment == 'Negative':
+            negative_responses.append(response)
 
 # Load responses from CSV (Make sure 'responses.csv' is present)
 load_responses('responses.csv')
@@ -36,8 +41,13 @@ def analyze_sentiment(text):
     score = sentiment_analyzer.polarity_scores(text)
     return score['compound']
 
+# Function to analyze many texts at once (same compound scores as analyze_sentiment)
+def analyze_sentiments(texts):
+    return sentiment_batch.score_many(texts, sentiment_engine)
+
 # Function to generate a response based on sentiment
 def generate_response(user_input):
+    started = time.perf_counter()
     sentiment_score = analyze_sentiment(user_input)
     
     if sentiment_score >= 0.05:
@@ -50,6 +60,7 @@ def generate_response(user_input):
         detected_sentiment = 'neutral'
         response = random.choice(neutral_responses)
     
+    request_log.log_request('generate_response', time.perf_counter() - started, {"sentiment": detected_sentiment})
     logging.info(f"Detected Sentiment: {detected_sentiment}")
     return response
 
@@ -0,0 +1,263 @@
+# data_cache.py
+# Report load time and memory, CSV against cache: python data_cache.py [file.csv ...]
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Directory of the columnar caches; an empty value parses the CSV on every load
+CACHE_DIR = os.environ.get('SERENE_DATA_CACHE', 'data_cache')
+
+# Bump whenever the cache layout or the type conversions change
+CACHE_VERSION = 1
+
+# Column kinds per data file: 'category', 'text', 'int' or 'float' (missing values allowed).
+# Columns starting with a key of 'prefixes' take its kind; any other column has its kind inferred.
+SCHEMAS = {
+    'habit_data.csv': {"columns": {
+        "exercise_frequency": 'category',
+        "social_media_hours": 'category',
+        "stress_level": 'category',
+        "mindfulness_frequency": 'category',
+        "recommended_habit": 'category'
+    }},
+    'habits_data.csv': {"columns": {"habit_name": 'text', "time_needed": 'int'}},
+    'music_data.csv': {"columns": {"title": 'text', "file_path": 'text', "mood": 'category'},
+                       "prefixes": {"feature": 'float'}},
+    'responses.csv': {"columns": {"Sentiment": 'category', "Response": 'text'}}
+}
+
+# An unlisted non-numeric column becomes a category when at most this share of its values are distinct
+CATEGORY_RATIO = 0.5
+
+def _signature(filename):
+    stat = os.stat(filename)
+    return {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+def _file_digest(filename):
+    with open(filename, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def _cache_directory(filename):
+    # One directory per source path, so equally named files in different directories do not collide
+    path = os.path.abspath(filename)
+    return os.path.join(CACHE_DIR, f'{os.path.basename(path)}-{hashlib.sha1(path.encode()).hexdigest()[:12]}')
+
+def _infer_kind(values):
+    numeric = pd.to_numeric(values, errors='coerce')
+    if len(values) and not numeric.isna().any():
+        return 'int' if (numeric == numeric.round()).all() else 'float'
+    if values.nunique() <= max(1, CATEGORY_RATIO * len(values)):
+        return 'category'
+    return 'text'
+
+def _kinds(filename, columns):
+    schema = SCHEMAS.get(os.path.basename(filename), {})
+    missing = [column for column in schema.get('columns', {}) if column not in columns]
+    if missing:
+        raise ValueError(f"{filename} is missing the columns {', '.join(missing)}")
+
+    kinds = {}
+    for column in columns:
+        kind = schema.get('columns', {}).get(column)
+        for prefix, prefix_kind in schema.get('prefixes', {}).items():
+            if kind is None and column.startswith(prefix):
+                kind = prefix_kind
+        kinds[column] = kind
+    return kinds
+
+def parse_csv(filename):
+    """Read and validate filename against its schema; returns (typed DataFrame, {column: kind}).
+
+    Blank lines (habit_data.csv starts with one) are skipped. A line with more fields than the
+    header (an unquoted comma in the last column, as in responses.csv) keeps the extra text in
+    the last column.
+    """
+    options = {"dtype": str, "keep_default_na": False, "skip_blank_lines": True}
+    try:
+        raw = pd.read_csv(filename, **options)
+    except pd.errors.ParserError:
+        # Only the python engine can repair lines; it is slower, so it is the fallback
+        header = len(pd.read_csv(filename, nrows=0, skip_blank_lines=True).columns)
+        raw = pd.read_csv(filename, engine='python', on_bad_lines=lambda fields: fields[:header - 1] +
+                          [','.join(fields[header - 1:])], **options)
+    kinds = _kinds(filename, list(raw.columns))
+    columns = {}
+    for column, kind in kinds.items():
+        values = raw[column].str.strip()
+        kind = kinds[column] = kind or _infer_kind(values)
+        if kind == 'category':
+            columns[column] = pd.Categorical(raw[column])
+        elif kind == 'text':
+            columns[column] = raw[column]
+        else:
+            numeric = pd.to_numeric(values, errors='coerce')
+            invalid = numeric.isna() & ((values != '') | (kind == 'int'))
+            if kind == 'int' and not invalid.any():
+                invalid = numeric != numeric.round()
+            if invalid.any():
+                row = int(np.flatnonzero(invalid.to_numpy())[0])
+                raise ValueError(f"{filename}: {column} must be {'an integer' if kind == 'int' else 'a number'}, "
+                                 f"got {raw[column].iloc[row]!r} in data row {row + 1}")
+            if kind == 'int':
+                columns[column] = pd.to_numeric(numeric, downcast='integer').to_numpy()
+            else:
+                columns[column] = numeric.to_numpy(dtype=np.float32)
+    return pd.DataFrame(columns, index=raw.index), kinds
+
+def _write_cache(directory, frame, kinds, source):
+    os.makedirs(directory, exist_ok=True)
+    tag = f'{os.getpid()}-{time.time_ns()}'
+    columns = []
+    for number, (column, kind) in enumerate(kinds.items()):
+        series = frame[column]
+        entry = {"name": column, "kind": kind, "files": {}}
+        if kind == 'category':
+            arrays = {"codes": series.cat.codes.to_numpy()}
+            entry['categories'] = series.cat.categories.tolist()
+        elif kind == 'text':
+            # All values as one UTF-8 buffer, with the character offset where each one starts
+            lengths = series.str.len().to_numpy(dtype=np.int64)
+            arrays = {
+                "text": np.frombuffer(''.join(series.tolist()).encode('utf-8'), dtype=np.uint8),
+                "offsets": np.concatenate([[0], np.cumsum(lengths)])
+            }
+        else:
+            arrays = {"values": series.to_numpy()}
+        for part, array in arrays.items():
+            name = f'{number}-{part}-{tag}.npy'
+            np.save(os.path.join(directory, name), array)
+            entry['files'][part] = name
+        columns.append(entry)
+
+    meta_path = os.path.join(directory, 'meta.json')
+    previous = _read_meta(directory)
+    temporary = f'{meta_path}.{tag}'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump({"version": CACHE_VERSION, "source": source, "rows": len(frame), "columns": columns}, file)
+    os.replace(temporary, meta_path)
+
+    # Processes that already mapped the old columns keep them until they let go
+    if previous is not None:
+        for entry in previous['columns']:
+            for name in entry['files'].values():
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_VERSION else None
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, 'meta.json')
+    temporary = f'{path}.{os.getpid()}-{time.time_ns()}'
+    try:
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(temporary, path)
+    except OSError:
+        pass
+
+def _read_cache(directory, meta):
+    columns = {}
+    for entry in meta['columns']:
+        # Copy-on-write maps: pages are shared until a caller modifies a column
+        arrays = {part: np.load(os.path.join(directory, name), mmap_mode='c') for part, name in entry['files'].items()}
+        if entry['kind'] == 'category':
+            columns[entry['name']] = pd.Categorical.from_codes(arrays['codes'], entry['categories'])
+        elif entry['kind'] == 'text':
+            text = arrays['text'].tobytes().decode('utf-8')
+            offsets = arrays['offsets'].tolist()
+            columns[entry['name']] = pd.Series([text[start:stop] for start, stop in zip(offsets, offsets[1:])],
+                                               dtype=str)
+        else:
+            columns[entry['name']] = arrays['values']
+    return pd.DataFrame(columns, copy=False)
+
+def load_csv(filename):
+    """Typed, validated DataFrame for filename, from its columnar cache while the file is unchanged.
+
+    Category columns hold compact integer codes, numeric columns the smallest fitting dtype.
+    A rebuilt cache replaces the old one atomically. Raises ValueError if the file does not
+    match its schema.
+    """
+    if not CACHE_DIR:
+        return parse_csv(filename)[0]
+
+    directory = _cache_directory(filename)
+    signature = _signature(filename)
+    meta = _read_meta(directory)
+    if meta is not None:
+        source = meta['source']
+        unchanged = source['mtime'] == signature['mtime'] and source['size'] == signature['size']
+        if not unchanged and source['size'] == signature['size']:
+            # A touched but unchanged file only needs its recorded mtime refreshed
+            unchanged = source['digest'] == _file_digest(filename)
+            if unchanged:
+                meta['source'] = dict(source, mtime=signature['mtime'])
+                _write_meta(directory, meta)
+        if unchanged:
+            try:
+                return _read_cache(directory, meta)
+            except (OSError, ValueError, KeyError):
+                pass  # Replaced by another process while being read; rebuilt below
+
+    digest = _file_digest(filename)
+    frame, kinds = parse_csv(filename)
+    try:
+        _write_cache(directory, frame, kinds, dict(signature, digest=digest))
+    except OSError:
+        pass  # A read-only deployment still gets the parsed frame
+    return frame
+
+def report(filename):
+    """Load time and in-memory size of filename with a default pd.read_csv and through the cache."""
+    started = time.perf_counter()
+    try:
+        plain = pd.read_csv(filename)
+    except pd.errors.ParserError:
+        # What the csv.DictReader loaders built, for files pandas cannot read as they are
+        with open(filename, encoding='utf-8', newline='') as file:
+            plain = pd.DataFrame(list(csv.DictReader(file)))
+    csv_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    load_csv(filename)  # Builds the cache if it is missing or stale
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    cached = load_csv(filename)
+    cache_seconds = time.perf_counter() - started
+
+    directory = _cache_directory(filename)
+    return {
+        "file": filename,
+        "rows": len(cached),
+        "csv_bytes": os.path.getsize(filename),
+        "csv_load_ms": round(csv_seconds * 1000, 3),
+        "csv_memory_bytes": int(plain.memory_usage(deep=True).sum()),
+        "cache_build_ms": round(build_seconds * 1000, 3),
+        "cache_load_ms": round(cache_seconds * 1000, 3),
+        "cache_memory_bytes": int(cached.memory_usage(deep=True).sum()),
+        "cache_bytes": sum(entry.stat().st_size for entry in os.scandir(directory)) if CACHE_DIR else 0,
+        "dtypes": {column: str(dtype) for column, dtype in cached.dtypes.items()}
+    }
+
+if __name__ == '__main__':
+    for filename in sys.argv[1:] or list(SCHEMAS):
+        result = report(filename)
+        print(f"{filename} ({result['rows']} rows, {result['csv_bytes']} bytes)")
+        print(f"  read_csv: {result['csv_load_ms']:9.3f} ms  {result['csv_memory_bytes']:>12} bytes in memory")
+        print(f"  cache:    {result['cache_load_ms']:9.3f} ms  {result['cache_memory_bytes']:>12} bytes in memory  "
+              f"({result['cache_bytes']} bytes on disk, first build {result['cache_build_ms']:.3f} ms)")
+        print("  " + ", ".join(f"{column}: {dtype}" for column, dtype in result['dtypes'].items()))
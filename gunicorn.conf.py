@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+# Production entry point: gunicorn -c gunicorn.conf.py
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'app:app'
+bind = os.environ.get('SERENE_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('SERENE_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('SERENE_THREADS', 1))
+
+# Import app.py (models, lexicon, catalogs) once in the master; forked workers share it copy-on-write
+preload_app = True
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker is forked
+    import app
+    app.warm_up()
+
+    # Move everything built so far out of the collector's reach, so workers don't copy those pages
+    gc.freeze()
+    server.log.info("Models and catalogs warmed up; forking %s workers", workers)
@@ -1,21 +1,40 @@
 # habit_clustering.py
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+import hashlib
+import os
+import threading
 
-def load_data():
-    # Load the habits data
-    data = pd.read_csv('habits_data.csv')  # File with columns 'habit_name' and 'time_needed'
+import numpy as np
+
+import data_cache
+import metrics
+
+HABITS_FILE = 'habits_data.csv'
+
+# Largest time budget (in minutes) with a precomputed optimal plan
+MAX_PLAN_BUDGET = int(os.environ.get('HABIT_PLAN_MAX_BUDGET', 1440))
+
+# Clustered catalogs keyed by file path, rebuilt only when the file changes
+_cluster_cache = {}
+_cluster_cache_lock = threading.Lock()
+
+def load_data(filename=HABITS_FILE):
+    # Load the habits data, typed and validated (see data_cache.py)
+    data = data_cache.load_csv(filename)  # File with columns 'habit_name' and 'time_needed'
     return data
 
-def preprocess_and_cluster(data):
+def fit_clusters(data):
+    # scikit-learn is only imported when the catalog is actually refit
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.cluster import KMeans
+
     # Standardize the "time_needed" column
     scaler = StandardScaler()
     data['time_needed_scaled'] = scaler.fit_transform(data[['time_needed']])
 
     # Apply K-means clustering
     kmeans = KMeans(n_clusters=3, random_state=42)
-    data['cluster'] = kmeans.fit_predict(data[['time_needed_scaled']])
+    with metrics.stage('kmeans_fit'):
+        data['cluster'] = kmeans.fit_predict(data[['time_needed_scaled']])
     
     # Sort clusters based on average time, from shortest to longest
     cluster_order = data.groupby('cluster')['time_needed'].mean().sort_values().index
@@ -24,42 +43,237 @@ def preprocess_and_cluster(data):
     
     # Drop the scaled column to simplify output
     data.drop(columns='time_needed_scaled', inplace=True)
+
+    # Cluster centres in minutes, indexed by ordered cluster, for assigning new habits later
+    centers = scaler.inverse_transform(kmeans.cluster_centers_)[:, 0]
+    ordered_centers = np.empty(len(centers))
+    for cluster, ordered in cluster_mapping.items():
+        ordered_centers[ordered] = centers[cluster]
     
-    return data
+    return data, ordered_centers
 
-def recommend_habits(data, available_time):
-    # Calculate possible time-ordered clusters based on user’s available time
-    recommendations = []
+def preprocess_and_cluster(data):
+    return fit_clusters(data)[0]
+
+def build_plan_table(times, max_budget=MAX_PLAN_BUDGET):
+    """0/1 knapsack over time_needed: the best reachable total for every budget up to max_budget."""
+    table = {
+        "reachable": np.zeros(max_budget + 1, dtype=bool),
+        "via": np.full(max_budget + 1, -1, dtype=np.int32),
+        "best": None
+    }
+    table['reachable'][0] = True
+    for item, time_needed in enumerate(times):
+        add_plan_item(table, item, time_needed)
+    if table['best'] is None:
+        table['best'] = np.zeros(max_budget + 1, dtype=np.int64)
+    return table
+
+def add_plan_item(table, item, time_needed):
+    # Totals that become reachable by adding this habit to a plan made only of earlier habits
+    reachable, via = table['reachable'], table['via']
+    time_needed = int(time_needed)
+    if 0 < time_needed < len(reachable):
+        newly = np.flatnonzero(reachable[:-time_needed] & ~reachable[time_needed:]) + time_needed
+        reachable[newly] = True
+        via[newly] = item
+
+    # best[b] is the largest reachable total that does not exceed b
+    totals = np.where(reachable, np.arange(len(reachable)), 0)
+    table['best'] = np.maximum.accumulate(totals)
+
+def plan_for_budget(table, habits, times, available_time):
+    budget = max(int(available_time), 0)
+    if budget >= len(table['best']):
+        # Beyond the precomputed range: every habit fits once the budget covers them all,
+        # and anything shorter gets a table built for this budget alone
+        if budget >= sum(times):
+            return list(habits), int(sum(times))
+        table = build_plan_table(times, budget)
+    total_time = int(table['best'][budget])
+
+    selected = []
+    remaining = total_time
+    while remaining > 0:
+        item = int(table['via'][remaining])
+        selected.append(item)
+        remaining -= int(times[item])
+    selected.sort()
+
+    return [habits[item] for item in selected], total_time
+
+def build_cluster_index(data, max_budget=MAX_PLAN_BUDGET, centers=None, plans=True):
+    # Precompute, per ordered cluster, the habit names, running total of time needed and plan table.
+    # plans=False leaves out the plan tables, for callers that only make greedy selections.
+    clusters = []
     for cluster in data['ordered_cluster'].unique():
         cluster_data = data[data['ordered_cluster'] == cluster]
-        
-        total_time = 0
-        selected_habits = []
-        
-        # Select habits until reaching the user's available time
-        for _, row in cluster_data.iterrows():
-            if total_time + row['time_needed'] > available_time:
-                break
-            selected_habits.append(row['habit_name'])
-            total_time += row['time_needed']
-        
-        if selected_habits:
+        times = cluster_data['time_needed'].tolist()
+        clusters.append({
+            "cluster": int(cluster),
+            "habits": cluster_data['habit_name'].tolist(),
+            "times": times,
+            "cumulative_time": np.cumsum(cluster_data['time_needed'].to_numpy()),
+            "plans": build_plan_table(times, max_budget) if plans else None
+        })
+
+    habits = data['habit_name'].tolist()
+    times = data['time_needed'].tolist()
+    return {
+        "clusters": clusters,
+        "habits": habits,
+        "times": times,
+        "plans": build_plan_table(times, max_budget) if plans else None,
+        "centers": centers
+    }
+
+def add_habit(index, habit_name, time_needed):
+    """Assign a new habit to its nearest existing cluster and extend the tables without a refit."""
+    # With one standardized feature, the nearest KMeans centre is also the nearest in minutes
+    cluster = int(np.argmin(np.abs(index['centers'] - time_needed)))
+
+    entry = next((entry for entry in index['clusters'] if entry['cluster'] == cluster), None)
+    if entry is None:
+        entry = {
+            "cluster": cluster,
+            "habits": [],
+            "times": [],
+            "cumulative_time": np.zeros(0, dtype=np.int64),
+            "plans": build_plan_table([], len(index['plans']['best']) - 1)
+        }
+        index['clusters'].append(entry)
+
+    entry['habits'].append(habit_name)
+    entry['times'].append(time_needed)
+    entry['cumulative_time'] = np.append(entry['cumulative_time'], entry['cumulative_time'][-1:].sum() + time_needed)
+    add_plan_item(entry['plans'], len(entry['times']) - 1, time_needed)
+
+    index['habits'].append(habit_name)
+    index['times'].append(time_needed)
+    add_plan_item(index['plans'], len(index['times']) - 1, time_needed)
+    return cluster
+
+def copy_index(index):
+    """Copy of an index that add_habit() can extend without changing the original."""
+    def copy_table(table):
+        return {key: value.copy() for key, value in table.items()}
+
+    return dict(
+        index,
+        habits=list(index['habits']),
+        times=list(index['times']),
+        plans=copy_table(index['plans']),
+        clusters=[
+            dict(entry, habits=list(entry['habits']), times=list(entry['times']), plans=copy_table(entry['plans']))
+            for entry in index['clusters']
+        ]
+    )
+
+def recommend_from_index(index, available_time):
+    # The greedy selection is the longest prefix whose running total fits the available time
+    recommendations = []
+    for entry in index['clusters']:
+        count = int(np.searchsorted(entry['cumulative_time'], available_time, side='right'))
+        if count:
             recommendations.append({
-                "cluster": cluster,
-                "habits": selected_habits,
+                "cluster": entry['cluster'],
+                "habits": entry['habits'][:count],
+                "total_time": entry['cumulative_time'][count - 1].item()
+            })
+    return recommendations
+
+def recommend_optimal(index, available_time):
+    # Per cluster, the subset of habits that uses as much of the available time as possible
+    recommendations = []
+    for entry in index['clusters']:
+        habits, total_time = plan_for_budget(entry['plans'], entry['habits'], entry['times'], available_time)
+        if habits:
+            recommendations.append({
+                "cluster": entry['cluster'],
+                "habits": habits,
                 "total_time": total_time
             })
-    
     return recommendations
 
+def best_overall_plan(index, available_time):
+    # The same optimisation across all clusters at once
+    habits, total_time = plan_for_budget(index['plans'], index['habits'], index['times'], available_time)
+    if not habits:
+        return None
+    return {"habits": habits, "total_time": total_time}
+
+def recommend_habits(data, available_time):
+    # Calculate possible time-ordered clusters based on user’s available time
+    # Only the running totals are needed, so no plan tables are built
+    return recommend_from_index(build_cluster_index(data, plans=False), available_time)
+
+def _file_digest(filename):
+    with open(filename, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def _extends_catalog(index, data):
+    # True when the new file only appends habits to the ones already indexed
+    count = len(index['habits'])
+    return (
+        len(data) >= count
+        and data['habit_name'].iloc[:count].tolist() == index['habits']
+        and data['time_needed'].iloc[:count].tolist() == index['times']
+    )
+
+def seed_cluster_index(index, digest, filename=HABITS_FILE):
+    """Install a prebuilt index (e.g. from a snapshot) for filename, whose content has this sha256 hex digest."""
+    stat = os.stat(filename)
+    with _cluster_cache_lock:
+        _cluster_cache[filename] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "digest": digest,
+            "index": index
+        }
+
+def get_cluster_index(filename=HABITS_FILE):
+    """Return the clustered catalog for filename, refitting only when its content changes."""
+    stat = os.stat(filename)
+    entry = _cluster_cache.get(filename)
+    if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return entry['index']
+
+    with _cluster_cache_lock:
+        entry = _cluster_cache.get(filename)
+        if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['index']
+
+        # A touched but unchanged file only needs its recorded mtime refreshed
+        digest = _file_digest(filename)
+        if entry is not None and entry['digest'] == digest:
+            index = entry['index']
+        else:
+            data = load_data(filename)
+            if entry is not None and _extends_catalog(entry['index'], data):
+                # Appended habits are slotted into a copy of the existing clusters and plan tables,
+                # so an index that was already handed out never changes under its readers
+                index = copy_index(entry['index'])
+                for row in data.iloc[len(index['habits']):].itertuples(index=False):
+                    add_habit(index, row.habit_name, int(row.time_needed))
+            else:
+                data, centers = fit_clusters(data)
+                index = build_cluster_index(data, centers=centers)
+
+        _cluster_cache[filename] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "digest": digest,
+            "index": index
+        }
+        return index
+
 def main():
     # Load data and preprocess
-    data = load_data()
-    clustered_data = preprocess_and_cluster(data)
+    cluster_index = get_cluster_index()
     
     # User input for available time
     available_time = int(input("Enter the time you have available (in minutes): "))
-    recommendations = recommend_habits(clustered_data, available_time)
+    recommendations = recommend_optimal(cluster_index, available_time)
     
     # Output results
     if recommendations:
@@ -1,42 +1,109 @@
+import numpy as np
 import pandas as pd
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.preprocessing import LabelEncoder
 
-# Load habit recommendation data
-data = pd.read_csv('habit_data.csv')
+import data_cache
 
-# Preprocess the data
-le_exercise = LabelEncoder()
-le_social_media = LabelEncoder()
-le_stress = LabelEncoder()
-le_mindfulness = LabelEncoder()
+# Questionnaire fields, in the column order the tree was trained on
+FEATURES = ['exercise_frequency', 'social_media_hours', 'stress_level', 'mindfulness_frequency']
 
-data['exercise_frequency'] = le_exercise.fit_transform(data['exercise_frequency'])
-data['social_media_hours'] = le_social_media.fit_transform(data['social_media_hours'])
-data['stress_level'] = le_stress.fit_transform(data['stress_level'])
-data['mindfulness_frequency'] = le_mindfulness.fit_transform(data['mindfulness_frequency'])
+HABIT_FILE = 'habit_data.csv'
 
-# Features and target variable
-X = data.drop('recommended_habit', axis=1)
-y = data['recommended_habit']
+def train_model(filename=HABIT_FILE):
+    """Fit the label encoders and decision tree; returns (clf, encoders in FEATURES order)."""
+    # scikit-learn is only imported when a model is actually trained
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.preprocessing import LabelEncoder
 
-# Train the Decision Tree model
-clf = DecisionTreeClassifier(random_state=42)
-clf.fit(X, y)
+    # Load habit recommendation data (answers arrive as categoricals, see data_cache.py)
+    data = data_cache.load_csv(filename)
+
+    # Preprocess the data
+    encoders = [LabelEncoder() for _ in FEATURES]
+    for feature, le in zip(FEATURES, encoders):
+        data[feature] = le.fit_transform(data[feature])
+
+    # Features and target variable
+    X = data.drop('recommended_habit', axis=1)
+    y = data['recommended_habit']
+
+    # Train the Decision Tree model
+    clf = DecisionTreeClassifier(random_state=42)
+    clf.fit(X, y)
+    return clf, encoders
+
+def __getattr__(name):
+    # The model is trained on first use rather than at import time
+    if name in ('clf', 'le_exercise', 'le_social_media', 'le_stress', 'le_mindfulness', 'habit_lookup'):
+        get_habit_lookup()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def compile_lookup(model, encoders):
+    """Evaluate the tree once over every combination of known answers."""
+    shape = tuple(len(le.classes_) for le in encoders)
+    grid = np.indices(shape).reshape(len(shape), -1).T
+    predictions = model.predict(pd.DataFrame(grid, columns=FEATURES))
+
+    # Dense table of habit codes indexed by the encoded answers, plus a dict keyed by the raw answers
+    habits, codes = np.unique(predictions, return_inverse=True)
+    answers = {}
+    for combo, code in zip(grid, codes):
+        key = tuple(le.classes_[i] for le, i in zip(encoders, combo))
+        answers[key] = str(habits[code])
+
+    return {
+        "classes": [list(le.classes_) for le in encoders],
+        "habits": habits,
+        "table": codes.reshape(shape),
+        "answers": answers
+    }
+
+def _unseen_value(lookup, values):
+    for feature, classes, value in zip(FEATURES, lookup['classes'], values):
+        if value is None:
+            return ValueError(f"missing {feature}")
+        if not isinstance(value, str) or value not in classes:
+            return ValueError(f"unseen {feature} value: {value!r}")
+    return ValueError("unseen combination of values")
+
+def lookup_habit(lookup, values):
+    # values are the raw answers in FEATURES order
+    try:
+        return lookup['answers'][tuple(values)]
+    except (KeyError, TypeError):
+        raise _unseen_value(lookup, values) from None
+
+def lookup_habits(lookup, questionnaires):
+    """Answer many questionnaires with one gather; invalid ones come back as ValueError instances."""
+    codes = []
+    for feature, classes in zip(FEATURES, lookup['classes']):
+        column = [q.get(feature) if isinstance(q, dict) else None for q in questionnaires]
+        column = [value if isinstance(value, str) else None for value in column]
+        codes.append(pd.Categorical(column, categories=classes).codes)
+    codes = np.stack(codes)
+
+    valid = (codes >= 0).all(axis=0)
+    results = np.empty(len(questionnaires), dtype=object)
+    results[valid] = lookup['habits'][lookup['table'][tuple(codes[:, valid])]]
+    for i in np.flatnonzero(~valid):
+        q = questionnaires[i] if isinstance(questionnaires[i], dict) else {}
+        results[i] = _unseen_value(lookup, [q.get(feature) for feature in FEATURES])
+    return results.tolist()
+
+def get_habit_lookup():
+    """Train the tree on first use and return its precompiled answers."""
+    lookup = globals().get('habit_lookup')
+    if lookup is None:
+        clf, encoders = train_model()
+        lookup = compile_lookup(clf, encoders)
+        globals().update(zip(('le_exercise', 'le_social_media', 'le_stress', 'le_mindfulness'), encoders))
+        globals().update(clf=clf, habit_lookup=lookup)
+    return lookup
 
 def recommend_habit(exercise_freq, social_media_hours, stress_level, mindfulness_freq):
-    # Transform user input into the same format as training data
+    # Look up the precompiled answer instead of encoding and predicting per call
     try:
-        user_input = pd.DataFrame({
-            'exercise_frequency': [le_exercise.transform([exercise_freq])[0]],
-            'social_media_hours': [le_social_media.transform([social_media_hours])[0]],
-            'stress_level': [le_stress.transform([stress_level])[0]],
-            'mindfulness_frequency': [le_mindfulness.transform([mindfulness_freq])[0]]
-        })
-
-        # Predict the habit
-        recommended_habit = clf.predict(user_input)
-        return recommended_habit[0]
+        return lookup_habit(get_habit_lookup(), (exercise_freq, social_media_hours, stress_level, mindfulness_freq))
     except ValueError as e:
         return f"Error: {str(e)}"
 
@@ -0,0 +1,198 @@
+# habit_streaming.py
+# Streaming clustering for habit catalogs too large to load at once.
+# Usage: python habit_streaming.py habits.csv clustered.csv [--features time_needed,effort] [--model model.json]
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from habit_clustering import HABITS_FILE
+
+# Numeric columns clustered on, unless given explicitly
+CLUSTER_FEATURES = os.environ.get('HABIT_CLUSTER_FEATURES', 'time_needed').split(',')
+
+# Rows read from the CSV at a time
+CHUNK_ROWS = int(os.environ.get('HABIT_CHUNK_ROWS', 100000))
+
+# Rows kept in the uniform sample the cluster count is chosen on
+SAMPLE_ROWS = 20000
+
+# Rows each candidate count is scored on; the silhouette costs the square of this
+SILHOUETTE_ROWS = 2000
+
+# Cluster counts tried when choosing one automatically
+CLUSTER_COUNTS = range(2, 9)
+
+def _chunks(filename, chunk_rows):
+    return pd.read_csv(filename, chunksize=chunk_rows)
+
+def _features(chunk, features):
+    # Feature matrix of a chunk and the mask of rows with every feature present
+    missing = [feature for feature in features if feature not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+    values = chunk[features].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    return values, ~np.isnan(values).any(axis=1)
+
+def scan(filename, features, chunk_rows=CHUNK_ROWS, sample_rows=SAMPLE_ROWS, seed=42):
+    """One pass over the file: row count, per-feature mean and standard deviation, and a uniform sample.
+
+    The sample keeps the rows with the smallest random keys seen so far (bottom-k sampling),
+    so memory stays at one chunk plus the sample.
+    """
+    rng = np.random.default_rng(seed)
+    count = 0
+    total = np.zeros(len(features))
+    squares = np.zeros(len(features))
+    sample = np.empty((0, len(features)))
+    keys = np.empty(0)
+    for chunk in _chunks(filename, chunk_rows):
+        values, valid = _features(chunk, features)
+        values = values[valid]
+        count += len(values)
+        total += values.sum(axis=0)
+        squares += (values * values).sum(axis=0)
+
+        sample = np.concatenate([sample, values])
+        keys = np.concatenate([keys, rng.random(len(values))])
+        if len(keys) > sample_rows:
+            keep = np.argpartition(keys, sample_rows)[:sample_rows]
+            sample, keys = sample[keep], keys[keep]
+
+    if not count:
+        raise ValueError(f"No rows with all of {', '.join(features)} in {filename}")
+    mean = total / count
+    scale = np.sqrt(np.maximum(squares / count - mean * mean, 0.0))
+    scale[scale == 0] = 1.0  # Constant features, as StandardScaler treats them
+    return {"rows": count, "mean": mean, "scale": scale, "sample": sample}
+
+def choose_cluster_count(sample, counts=CLUSTER_COUNTS, seed=42):
+    """The cluster count with the best silhouette score on the (standardized) sample.
+
+    Each count is scored on SILHOUETTE_ROWS rows of the sample, and only counts leaving at
+    least two distinct values per cluster are tried. Returns (count, {count: score}).
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+
+    distinct = len(np.unique(sample, axis=0))
+    scores = {}
+    for k in counts:
+        if k > distinct // 2:
+            break
+        labels = MiniBatchKMeans(n_clusters=k, random_state=seed, n_init=3).fit_predict(sample)
+        if len(np.unique(labels)) > 1:
+            scores[k] = float(silhouette_score(sample, labels, sample_size=min(SILHOUETTE_ROWS, len(sample)),
+                                               random_state=seed))
+    if not scores:
+        return min(distinct, min(counts)), scores
+    return max(scores, key=scores.get), scores
+
+def fit_streaming(filename=HABITS_FILE, features=None, chunk_rows=CHUNK_ROWS, n_clusters=None, seed=42):
+    """Fit a mini-batch KMeans model over the CSV chunk by chunk.
+
+    With n_clusters=None the count is chosen on a sample (see choose_cluster_count). Returns a
+    model for assign_clusters(): standardization, centres ordered by their first feature
+    (shortest first, for time_needed) and the scores behind the chosen count.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    features = list(features or CLUSTER_FEATURES)
+    stats = scan(filename, features, chunk_rows, seed=seed)
+    sample = (stats['sample'] - stats['mean']) / stats['scale']
+    scores = {}
+    if n_clusters is None:
+        n_clusters, scores = choose_cluster_count(sample, seed=seed)
+    n_clusters = min(n_clusters, len(np.unique(sample, axis=0)))
+
+    # Start from centres fitted on the sample, then refine them on every chunk
+    initial = MiniBatchKMeans(n_clusters=n_clusters, random_state=seed, n_init=3).fit(sample)
+    # No reassignment of sparse centres: chunks of a sorted file would drag them all into one region
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=initial.cluster_centers_, n_init=1,
+                             reassignment_ratio=0, random_state=seed)
+    with metrics.stage('kmeans_fit'):
+        for chunk in _chunks(filename, chunk_rows):
+            values, valid = _features(chunk, features)
+            if valid.sum() >= n_clusters:
+                kmeans.partial_fit((values[valid] - stats['mean']) / stats['scale'])
+    centers = getattr(kmeans, 'cluster_centers_', initial.cluster_centers_)
+
+    # Clusters are numbered from the shortest to the longest, as in habit_clustering.fit_clusters()
+    order = np.argsort(centers[:, 0], kind='stable')
+    return {
+        "features": features,
+        "mean": stats['mean'],
+        "scale": stats['scale'],
+        "centers": centers[order],
+        "rows": stats['rows'],
+        "scores": scores
+    }
+
+def assign_clusters(model, data):
+    """Ordered cluster of every row of a DataFrame (or list of dicts); -1 where a feature is missing.
+
+    New habits are placed with the fitted centres, without a refit.
+    """
+    if not isinstance(data, pd.DataFrame):
+        data = pd.DataFrame(list(data))
+    values, valid = _features(data, model['features'])
+    clusters = np.full(len(data), -1, dtype=np.int64)
+    if valid.any():
+        scaled = (values[valid] - model['mean']) / model['scale']
+        # Squared distances to every centre, without materializing a rows x centres x features array
+        distances = (scaled * scaled).sum(axis=1)[:, None] - 2 * scaled @ model['centers'].T + \
+            (model['centers'] * model['centers']).sum(axis=1)
+        clusters[valid] = distances.argmin(axis=1)
+    return clusters
+
+def cluster_file(filename, output, model, chunk_rows=CHUNK_ROWS):
+    """Write filename to output with an ordered_cluster column, one chunk at a time; returns rows written."""
+    written = 0
+    for number, chunk in enumerate(_chunks(filename, chunk_rows)):
+        chunk['ordered_cluster'] = assign_clusters(model, chunk)
+        chunk.to_csv(output, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+        written += len(chunk)
+    return written
+
+def save_model(model, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in model.items()},
+                  file, indent=2)
+
+def load_model(path):
+    with open(path, encoding='utf-8') as file:
+        model = json.load(file)
+    for key in ('mean', 'scale', 'centers'):
+        model[key] = np.array(model[key], dtype=np.float64)
+    model['scores'] = {int(k): score for k, score in model['scores'].items()}
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster a habit catalog in chunks, without loading it at once.")
+    parser.add_argument('input', nargs='?', default=HABITS_FILE)
+    parser.add_argument('output', help="CSV written with an ordered_cluster column")
+    parser.add_argument('--features', default=','.join(CLUSTER_FEATURES), help="comma-separated numeric columns")
+    parser.add_argument('--clusters', type=int, help="cluster count (chosen automatically by default)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--model', help="fit nothing and assign with this saved model if it exists, else save the fit here")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.model and os.path.exists(args.model):
+        model = load_model(args.model)
+    else:
+        model = fit_streaming(args.input, args.features.split(','), args.chunk_rows, args.clusters)
+        if args.model:
+            save_model(model, args.model)
+        scores = ', '.join(f"{k}: {score:.3f}" for k, score in model['scores'].items())
+        print(f"Fitted {len(model['centers'])} clusters on {model['rows']} rows" + (f" (silhouette {scores})" if scores else ""))
+
+    rows = cluster_file(args.input, args.output, model, args.chunk_rows)
+    print(f"Wrote {rows} rows to {args.output} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# journal_log.py
+import atexit
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+# Directory holding the journal segments
+JOURNAL_DIR = os.environ.get('SERENE_JOURNAL_DIR', 'journal')
+
+# A segment is closed and a new one started once it would grow past this size
+SEGMENT_MAX_BYTES = int(float(os.environ.get('SERENE_JOURNAL_SEGMENT_MB', 64)) * 1024 * 1024)
+
+# fsync every commit; with 0 entries are only handed to the OS and can be lost on power failure
+JOURNAL_FSYNC = os.environ.get('SERENE_JOURNAL_FSYNC', '1') != '0'
+
+# Longest accepted user ID and entry text
+MAX_USER_ID_LENGTH = 128
+MAX_ENTRY_LENGTH = 20000
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+
+def _day(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).date().isoformat()
+
+class JournalLog:
+    """Append-only journal in JSON-lines segments, with group commit and per-user daily mood aggregates.
+
+    Callers of append() queue their records and wait; a writer thread takes everything queued
+    while the previous commit was in progress and writes it with one write() and one fsync().
+    Every process writes its own segments. The aggregates are folded from the bytes appended to
+    any segment since they were last read, so history is read once per process, at startup.
+    """
+
+    def __init__(self, directory=JOURNAL_DIR, segment_max_bytes=SEGMENT_MAX_BYTES, fsync=JOURNAL_FSYNC):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self.written = 0
+        self.commits = 0
+        self.skipped = 0
+        os.makedirs(directory, exist_ok=True)
+        # Per user: {day: [entries, score total, min score, max score, positive, neutral, negative]}
+        self._days = {}
+        # Bytes of each segment already folded into the aggregates
+        self._offsets = {}
+        self._start()
+        self.catch_up()
+        # The writer thread does not survive fork, so every forked worker starts its own
+        os.register_at_fork(after_in_child=self._start)
+        atexit.register(self.close)
+
+    def _start(self):
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._committed = threading.Condition(self._lock)
+        self._read_lock = threading.Lock()
+        self._pending = []
+        self._file = None
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._thread.start()
+
+    def append(self, records):
+        """Write records (dicts) durably; returns once the commit containing them is done.
+
+        Raises OSError if that commit failed.
+        """
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        commit = {"records": len(records), "done": False, "error": None}
+        with self._lock:
+            if self._stopping:
+                raise OSError("The journal is closed")
+            self._pending.append((data, commit))
+            self._work.notify()
+            while not commit['done']:
+                self._committed.wait()
+        if commit['error'] is not None:
+            raise commit['error']
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopping:
+                    self._work.wait()
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+
+            error = None
+            try:
+                self._write(b''.join(data for data, _ in batch))
+            except OSError as e:
+                logging.exception("Journal commit failed")
+                error = e
+
+            with self._lock:
+                for _, commit in batch:
+                    commit['done'] = True
+                    commit['error'] = error
+                if error is None:
+                    self.written += sum(commit['records'] for _, commit in batch)
+                    self.commits += 1
+                self._committed.notify_all()
+
+    def _write(self, data):
+        if self._file is not None and self._file.tell() and self._file.tell() + len(data) > self.segment_max_bytes:
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            # Named by creation time, then process, so sorting the names orders segments by age
+            name = f'{time.time_ns():020d}-{os.getpid()}.jsonl'
+            self._file = open(os.path.join(self.directory, name), 'ab', buffering=0)
+        self._file.write(data)
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def catch_up(self):
+        """Fold every complete line appended to any segment since the last call into the aggregates."""
+        with self._read_lock:
+            self._catch_up()
+
+    def _catch_up(self):
+        # Called with _read_lock held
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.jsonl'):
+                continue
+            path = os.path.join(self.directory, name)
+            offset = self._offsets.get(name, 0)
+            try:
+                if os.path.getsize(path) <= offset:
+                    continue
+                with open(path, 'rb') as file:
+                    file.seek(offset)
+                    data = file.read()
+            except OSError:
+                continue
+            # A line still being written by another process is left for the next call
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                self._fold(line)
+            self._offsets[name] = offset + end
+
+    def _fold(self, line):
+        try:
+            record = json.loads(line)
+            user_id, day, score = record['user_id'], record['day'], float(record['score'])
+            column = 4 + SENTIMENTS.index(record['sentiment'])
+        except (ValueError, KeyError, TypeError):
+            self.skipped += 1
+            return
+        days = self._days.setdefault(user_id, {})
+        aggregate = days.get(day)
+        if aggregate is None:
+            days[day] = aggregate = [0, 0.0, score, score, 0, 0, 0]
+        aggregate[0] += 1
+        aggregate[1] += score
+        aggregate[2] = min(aggregate[2], score)
+        aggregate[3] = max(aggregate[3], score)
+        aggregate[column] += 1
+
+    def daily_moods(self, user_id, days=None):
+        """The user's mood per day, oldest first; with days, only the most recent `days` days with entries."""
+        # Read under the same lock as the folding, so no aggregate is seen half updated
+        with self._read_lock:
+            self._catch_up()
+            by_day = self._days.get(user_id, {})
+            selected = sorted(by_day)
+            if days is not None:
+                selected = selected[-days:] if days > 0 else []
+            moods = []
+            for day in selected:
+                entries, total, low, high, *counts = by_day[day]
+                moods.append({
+                    "day": day,
+                    "entries": entries,
+                    "mean_score": round(total / entries, 4),
+                    "min_score": low,
+                    "max_score": high,
+                    "sentiments": dict(zip(SENTIMENTS, counts))
+                })
+        return moods
+
+    def stats(self):
+        return {"written": self.written, "commits": self.commits, "skipped": self.skipped}
+
+    def close(self):
+        """Commit everything queued and stop the writer."""
+        with self._lock:
+            self._stopping = True
+            self._work.notify()
+        self._thread.join(timeout=5)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def make_record(user_id, entry, score, sentiment, mood=None, prompt=None, timestamp=None):
+    """The journal line for one entry."""
+    timestamp = time.time() if timestamp is None else timestamp
+    return {
+        "time": round(timestamp, 6),
+        "day": _day(timestamp),
+        "user_id": user_id,
+        "entry": entry,
+        "score": score,
+        "sentiment": sentiment,
+        "mood": mood,
+        "prompt": prompt
+    }
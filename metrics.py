@@ -0,0 +1,137 @@
+# metrics.py
+import atexit
+import bisect
+import cProfile
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency buckets, from 50µs to 10s
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fraction of requests run under cProfile (0 disables profiling) and where aggregated stats are dumped
+PROFILE_SAMPLE_RATE = float(os.environ.get('SERENE_PROFILE_SAMPLE_RATE', 0))
+PROFILE_FILE = os.environ.get('SERENE_PROFILE_FILE', 'serene_profile.pstats')
+
+# Profiled requests between dumps of the aggregated stats
+PROFILE_DUMP_EVERY = 100
+
+class Histogram:
+    """Fixed-bucket latency histogram.
+
+    observe() takes no lock: each update is a few list/float operations under the GIL,
+    so a rare lost increment under heavy contention is traded for zero lock overhead.
+    """
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+# Histograms keyed by (metric, label value); created on first use
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def _histogram(metric, label):
+    histogram = _histograms.get((metric, label))
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault((metric, label), Histogram())
+    return histogram
+
+def observe_request(endpoint, seconds):
+    _histogram('request', endpoint).observe(seconds)
+
+def observe_stage(name, seconds):
+    _histogram('stage', name).observe(seconds)
+
+@contextmanager
+def stage(name):
+    """Time an internal stage of request handling, e.g. `with metrics.stage('vader'):`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+_METRICS = {
+    'request': ('serene_request_duration_seconds', 'endpoint', "Request latency by endpoint."),
+    'stage': ('serene_stage_duration_seconds', 'stage', "Latency of internal processing stages.")
+}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render(extra=None):
+    """Prometheus text exposition of every histogram.
+
+    extra maps counter names to (help, value), or other metric names to (help, value, type).
+    """
+    lines = []
+    for kind, (name, label, description) in _METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, value), histogram in sorted(_histograms.items()):
+            if metric != kind:
+                continue
+            labels = f'{label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.total}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+    for name, (description, value, *kind) in (extra or {}).items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind[0] if kind else "counter"}')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+# Aggregated profile of sampled requests
+_profile_stats = None
+_profiled = 0
+_profile_lock = threading.Lock()
+
+def start_profile():
+    """Return an enabled profiler for a sampled request, or None (the common, near-free path)."""
+    if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None  # Another profiler is already active
+    return profiler
+
+def finish_profile(profiler):
+    global _profile_stats, _profiled
+    profiler.disable()
+    with _profile_lock:
+        if _profile_stats is None:
+            _profile_stats = pstats.Stats(profiler)
+        else:
+            _profile_stats.add(profiler)
+        _profiled += 1
+        if _profiled % PROFILE_DUMP_EVERY == 0:
+            _profile_stats.dump_stats(PROFILE_FILE)
+
+def dump_profile(path=PROFILE_FILE):
+    """Write the aggregated profile (load with pstats.Stats(path)); returns False if nothing was sampled."""
+    with _profile_lock:
+        if _profile_stats is None:
+            return False
+        _profile_stats.dump_stats(path)
+        return True
+
+atexit.register(dump_profile)
@@ -0,0 +1,132 @@
+# model_registry.py
+import logging
+import os
+import threading
+import time
+
+# Seconds between checks of the source files; 0 disables background reloading
+RELOAD_INTERVAL = float(os.environ.get('SERENE_RELOAD_INTERVAL', 5))
+
+def _signature(source):
+    stat = os.stat(source)
+    return stat.st_mtime_ns, stat.st_size
+
+class ModelRegistry:
+    """Named artifacts, each rebuilt in a background thread when its source file changes.
+
+    A rebuilt artifact is validated and then published by replacing the whole mapping
+    with one reference assignment. A request that called current() keeps a consistent
+    set of versions for its lifetime, and an old version is freed as soon as the last
+    request holding it finishes. Each artifact also has a data version, the signature of the
+    source file it was built from, for tagging responses derived from it.
+    """
+
+    def __init__(self, interval=RELOAD_INTERVAL):
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self._specs = {}
+        self._versions = {}
+        self._tagged = {}
+        self._signatures = {}
+        self._build_lock = threading.Lock()
+        self._thread = None
+        # The watcher thread does not survive fork, so every forked worker starts its own
+        os.register_at_fork(after_in_child=self._restart)
+
+    def register(self, name, source, build, validate=None, artifact=None):
+        """Add an artifact built by build(source); validate(artifact) raises ValueError if it is unusable.
+
+        artifact is an already built version for the current source (e.g. from a snapshot);
+        without one the artifact is built now.
+        """
+        with self._build_lock:
+            self._specs[name] = (source, build, validate)
+            if artifact is None:
+                if not self._reload(name):
+                    raise RuntimeError(f"Could not build {name} from {source}")
+            else:
+                self._signatures[name] = _signature(source)
+                self._publish(name, artifact, self._signatures[name])
+
+    def current(self):
+        """The published {name: artifact} mapping; it is replaced, never modified."""
+        return self._versions
+
+    def get(self, name):
+        return self._versions[name]
+
+    def get_versioned(self, name):
+        """(artifact, data version) of name; the version changes whenever a rebuilt artifact is published."""
+        return self._tagged[name]
+
+    def refresh(self):
+        """Rebuild every artifact whose source changed; returns the names that were swapped in."""
+        swapped = []
+        with self._build_lock:
+            for name, (source, _, _) in list(self._specs.items()):
+                try:
+                    changed = _signature(source) != self._signatures.get(name)
+                except OSError:
+                    continue  # Missing while being replaced; the current version stays
+                if changed and self._reload(name):
+                    swapped.append(name)
+                    self.reloads += 1
+        return swapped
+
+    def stats(self):
+        return {"reloads": self.reloads, "failures": self.failures}
+
+    def _reload(self, name):
+        source, build, validate = self._specs[name]
+        # Taken before building, so a change made mid-build is picked up on the next check
+        signature = _signature(source)
+        started = time.perf_counter()
+        try:
+            artifact = build(source)
+            if validate is not None:
+                validate(artifact)
+        except Exception:
+            # Keep serving the previous version; retried once the file changes again
+            logging.exception(f"Rebuilding {name} from {source} failed")
+            self._signatures[name] = signature
+            self.failures += 1
+            return False
+
+        self._signatures[name] = signature
+        self._publish(name, artifact, signature)
+        logging.info(f"Published {name} from {source} in {time.perf_counter() - started:.3f}s")
+        return True
+
+    def _publish(self, name, artifact, signature):
+        # The same on every worker reading the same file, so versions agree across processes
+        mtime, size = signature
+        self._tagged = {**self._tagged, name: (artifact, f'{mtime:x}-{size:x}')}
+        self._versions = {**self._versions, name: artifact}
+
+    def start(self):
+        """Watch the sources from a daemon thread, every `interval` seconds."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='model-registry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def _restart(self):
+        self._build_lock = threading.Lock()
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logging.exception("Model registry refresh failed")
@@ -0,0 +1,237 @@
+# mp3_scanner.py
+import argparse
+import csv
+import hashlib
+import mmap
+import ntpath
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MUSIC_FILE = 'music_data.csv'
+
+# Columns the scanner maintains in addition to the catalog's own
+METADATA_COLUMNS = ['duration', 'bitrate', 'sample_rate', 'file_size', 'mtime_ns', 'content_hash']
+
+# Bitrates in kbps indexed by [version is MPEG-1][layer][bitrate index]
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+
+# Sample rates indexed by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+_SAMPLE_RATES = {0: [11025, 12000, 8000], 2: [22050, 24000, 16000], 3: [44100, 48000, 32000]}
+
+# How far past the tags to look for the first audio frame
+_SYNC_SEARCH_LIMIT = 64 * 1024
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _decode_text(payload):
+    if not payload:
+        return ''
+    encoding = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}.get(payload[0], 'latin-1')
+    return payload[1:].decode(encoding, errors='replace').split('\x00')[0].strip()
+
+def parse_id3v2(buffer):
+    """Return (tag length in bytes, {frame id: text}) for a leading ID3v2 tag."""
+    if buffer[:3] != b'ID3' or len(buffer) < 10:
+        return 0, {}
+    major, flags = buffer[3], buffer[5]
+    end = 10 + _syncsafe(buffer[6:10])
+    length = end + (10 if flags & 0x10 else 0)
+
+    tags = {}
+    position = 10
+    id_size, header_size = (3, 6) if major == 2 else (4, 10)
+    while position + header_size <= min(end, len(buffer)):
+        frame_id = bytes(buffer[position:position + id_size])
+        if not frame_id.strip(b'\x00'):
+            break  # Padding
+        if major == 2:
+            size = int.from_bytes(buffer[position + 3:position + 6], 'big')
+        elif major == 4:
+            size = _syncsafe(buffer[position + 4:position + 8])
+        else:
+            size = int.from_bytes(buffer[position + 4:position + 8], 'big')
+        if frame_id[:1] == b'T':
+            payload = bytes(buffer[position + header_size:position + header_size + size])
+            tags[frame_id.decode('latin-1')] = _decode_text(payload)
+        position += header_size + size
+    return length, tags
+
+def parse_frame_header(buffer, offset):
+    """Decode the MPEG audio frame header at offset, or return None if it is not one."""
+    if offset + 4 > len(buffer):
+        return None
+    b0, b1, b2, b3 = buffer[offset:offset + 4]
+    version_bits, layer_bits = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if b0 != 0xFF or b1 & 0xE0 != 0xE0 or version_bits == 1 or layer_bits == 0:
+        return None
+    if bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][rate_index]
+    padding = (b2 >> 1) & 1
+
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if layer == 3 and not mpeg1 else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        "mpeg1": mpeg1,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "samples": samples,
+        "mono": b3 >> 6 == 3,
+        "length": length
+    }
+
+def _find_first_frame(buffer, start):
+    # A sync word only counts if another valid frame header follows it
+    limit = min(len(buffer), start + _SYNC_SEARCH_LIMIT)
+    offset = buffer.find(b'\xff', start, limit)
+    while offset != -1:
+        header = parse_frame_header(buffer, offset)
+        if header is not None:
+            following = parse_frame_header(buffer, offset + header['length'])
+            if following is not None or offset + header['length'] >= len(buffer):
+                return offset, header
+        offset = buffer.find(b'\xff', offset + 1, limit)
+    return None, None
+
+def _vbr_header(buffer, offset, header):
+    """Return (frame count, byte count) from a Xing/Info or VBRI header in the first frame."""
+    if header['mpeg1']:
+        side_info = 17 if header['mono'] else 32
+    else:
+        side_info = 9 if header['mono'] else 17
+
+    xing = offset + 4 + side_info
+    if buffer[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = int.from_bytes(buffer[xing + 4:xing + 8], 'big')
+        position = xing + 8
+        frames = total_bytes = None
+        if flags & 1:
+            frames = int.from_bytes(buffer[position:position + 4], 'big')
+            position += 4
+        if flags & 2:
+            total_bytes = int.from_bytes(buffer[position:position + 4], 'big')
+        return frames, total_bytes
+
+    vbri = offset + 36
+    if buffer[vbri:vbri + 4] == b'VBRI':
+        total_bytes = int.from_bytes(buffer[vbri + 10:vbri + 14], 'big')
+        frames = int.from_bytes(buffer[vbri + 14:vbri + 18], 'big')
+        return frames, total_bytes
+    return None, None
+
+def scan_file(path, known=None):
+    """Read duration, bitrate, sample rate, tags and a content hash without decoding audio.
+
+    known is a previous result for the same path; its hash is reused if size and mtime match.
+    """
+    stat = os.stat(path)
+    result = {"file_size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "title": None, "genre": None,
+              "duration": None, "bitrate": None, "sample_rate": None, "content_hash": None}
+    if stat.st_size == 0:
+        return result
+
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        tag_length, tags = parse_id3v2(buffer)
+        result['title'] = tags.get('TIT2') or tags.get('TT2')
+        result['genre'] = tags.get('TCON') or tags.get('TCO')
+
+        # An ID3v1 tag occupies the last 128 bytes
+        audio_end = len(buffer)
+        if audio_end >= 128 and buffer[audio_end - 128:audio_end - 125] == b'TAG':
+            if not result['title']:
+                result['title'] = bytes(buffer[audio_end - 125:audio_end - 95]).split(b'\x00')[0].decode('latin-1').strip() or None
+            audio_end -= 128
+
+        offset, header = _find_first_frame(buffer, tag_length)
+        if header is not None:
+            frames, total_bytes = _vbr_header(buffer, offset, header)
+            result['sample_rate'] = header['sample_rate']
+            if frames:
+                # VBR (or LAME-tagged CBR): the frame count gives the exact duration
+                duration = frames * header['samples'] / header['sample_rate']
+                total_bytes = total_bytes or audio_end - offset
+                result['bitrate'] = int(total_bytes * 8 / duration) if duration else header['bitrate']
+            else:
+                duration = (audio_end - offset) * 8 / header['bitrate']
+                result['bitrate'] = header['bitrate']
+            result['duration'] = round(duration, 3)
+
+        if known and known.get('content_hash') and str(known.get('file_size')) == str(stat.st_size) \
+                and str(known.get('mtime_ns')) == str(stat.st_mtime_ns):
+            result['content_hash'] = known['content_hash']
+        else:
+            result['content_hash'] = hashlib.blake2b(buffer, digest_size=16).hexdigest()
+    return result
+
+def _file_name(file_path):
+    # Catalog paths may be Windows paths, so rows are matched on file name
+    return ntpath.basename(file_path)
+
+def refresh_catalog(music_dir, csv_path=MUSIC_FILE, workers=None):
+    """Scan every MP3 in music_dir and rewrite csv_path with up-to-date metadata.
+
+    Existing rows keep their title, file_path, mood and features. New files are added
+    with their ID3 title (or file name) and genre as mood. Rows whose file is not in
+    music_dir are kept unchanged.
+    """
+    fieldnames, rows = ['title', 'file_path', 'mood', 'feature1', 'feature2', 'feature3'], []
+    if os.path.exists(csv_path):
+        with open(csv_path, newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            fieldnames = list(reader.fieldnames or fieldnames)
+            rows = [row for row in reader if any(row.values())]
+    fieldnames += [column for column in METADATA_COLUMNS if column not in fieldnames]
+
+    by_name = {_file_name(row['file_path']): row for row in rows}
+    names = sorted(name for name in os.listdir(music_dir) if name.lower().endswith('.mp3'))
+    paths = [os.path.join(music_dir, name) for name in names]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(scan_file, paths, [by_name.get(name) for name in names]))
+
+    for name, path, result in zip(names, paths, results):
+        row = by_name.get(name)
+        if row is None:
+            row = {column: '' for column in fieldnames}
+            row['title'] = result['title'] or os.path.splitext(name)[0]
+            row['file_path'] = path
+            row['mood'] = (result['genre'] or 'unknown').lower()
+            rows.append(row)
+        for column in METADATA_COLUMNS:
+            row[column] = '' if result[column] is None else result[column]
+
+    temporary = csv_path + '.tmp'
+    with open(temporary, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temporary, csv_path)
+    return len(names)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Refresh music_data.csv from the MP3 files in a directory.")
+    parser.add_argument('music_dir', nargs='?', default='.')
+    parser.add_argument('csv_path', nargs='?', default=MUSIC_FILE)
+    parser.add_argument('--workers', type=int, default=None, help="scanner threads")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = refresh_catalog(args.music_dir, args.csv_path, args.workers)
+    print(f"Scanned {count} files into {args.csv_path} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,175 @@
+# music_catalog.py
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from audio_features import load_feature_store, with_store_features
+from music_similarity import feature_columns, mean_similarity, normalize_rows, rank
+
+MUSIC_FILE = 'music_data.csv'
+
+# Number of tracks returned per page when the client does not ask for a limit
+DEFAULT_PAGE_SIZE = 100
+
+# Mood indexes keyed by file path, extended in place when tracks are appended
+_catalog_cache = {}
+_catalog_lock = threading.Lock()
+
+# Extracted audio descriptors replace the hand-entered feature columns once the store is built
+feature_store = load_feature_store()
+
+def normalize_mood(mood):
+    return str(mood).strip().lower()
+
+def _new_catalog(header):
+    digest = hashlib.sha256()
+    digest.update(header)
+    return {
+        "header": header,
+        "offset": len(header),
+        "digest": digest,
+        "tracks": [],
+        "moods": {},
+        "mtime": None,
+        "size": None
+    }
+
+def _append_tracks(catalog, frame):
+    # Track IDs are row numbers in the CSV, so they stay stable while rows are appended
+    first_id = len(catalog['tracks'])
+    catalog['tracks'].extend(
+        {"title": title, "file_path": file_path}
+        for title, file_path in zip(frame['title'].tolist(), frame['file_path'].tolist())
+    )
+
+    # Keep each mood's tracks together, with every record already encoded as JSON
+    if feature_store is not None:
+        frame = with_store_features(frame, feature_store)
+    moods = frame['mood'].str.strip().str.lower()
+    features = frame[feature_columns(frame)].apply(pd.to_numeric, errors='coerce').fillna(0)
+    for mood, tracks in frame.groupby(moods, sort=False):
+        entry = catalog['moods'].setdefault(mood, {
+            "ids": [], "payloads": [], "features": [], "ranking": None
+        })
+        ids = (first_id + tracks.index).tolist()
+        entry['ids'].extend(ids)
+        entry['payloads'].extend(
+            json.dumps({"id": track_id, "title": title, "file_path": file_path})
+            for track_id, title, file_path in zip(ids, tracks['title'].tolist(), tracks['file_path'].tolist())
+        )
+        entry['features'].append(features.loc[tracks.index].to_numpy(dtype=np.float32))
+        entry['ranking'] = None
+
+def _copy_catalog(catalog):
+    # Appends go to a copy, so a catalog that was already handed out never changes under its readers
+    copy = dict(catalog, tracks=list(catalog['tracks']), digest=catalog['digest'].copy())
+    copy['moods'] = {
+        mood: dict(entry, ids=list(entry['ids']), payloads=list(entry['payloads']), features=list(entry['features']))
+        for mood, entry in catalog['moods'].items()
+    }
+    return copy
+
+def _ranking(entry):
+    # Ranked by mean cosine similarity to the rest of the mood; recomputed after appends
+    ranking = entry['ranking']
+    if ranking is None:
+        with _catalog_lock:
+            entry['features'] = [np.concatenate(entry['features'])]
+            ranking = rank(mean_similarity(normalize_rows(entry['features'][0])))
+            entry['ranking'] = ranking
+    return ranking
+
+def _prefix_matches(file, catalog):
+    # The already indexed bytes must be unchanged for the new ones to be a pure append
+    digest = hashlib.sha256()
+    remaining = catalog['offset']
+    while remaining:
+        chunk = file.read(min(remaining, 1 << 20))
+        if not chunk:
+            return False
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.hexdigest() == catalog['digest'].hexdigest()
+
+def _complete_row(header, tail):
+    # Whether an unterminated line has as many fields as the header
+    try:
+        fields = next(csv.reader([tail.decode('utf-8')]))
+        columns = next(csv.reader([header.decode('utf-8')]))
+    except (UnicodeDecodeError, StopIteration, csv.Error):
+        return False  # Cut inside a multi-byte character or a quoted field
+    return len(fields) >= len(columns)
+
+def _refresh(catalog, filename):
+    with open(filename, 'rb') as file:
+        if catalog is None or not _prefix_matches(file, catalog):
+            file.seek(0)
+            catalog = _new_catalog(file.readline())
+        new_bytes = file.read()
+    # A row still being written is left for the next refresh. An unterminated last row that
+    # already has every column is taken, since editors often save without a final newline.
+    end = new_bytes.rfind(b'\n') + 1
+    if end < len(new_bytes) and not _complete_row(catalog['header'], new_bytes[end:]):
+        new_bytes = new_bytes[:end]
+
+    if new_bytes:
+        catalog = _copy_catalog(catalog)
+    if new_bytes.strip():
+        frame = pd.read_csv(io.BytesIO(catalog['header'] + new_bytes), dtype=str, keep_default_na=False)
+        _append_tracks(catalog, frame)
+    catalog['offset'] += len(new_bytes)
+    catalog['digest'].update(new_bytes)
+    return catalog
+
+def get_catalog(filename=MUSIC_FILE):
+    """Return the mood index for filename, parsing only rows appended since the last call.
+
+    A row is indexed once its line ends with a newline, or, as the last line, once it has
+    every column.
+    """
+    stat = os.stat(filename)
+    catalog = _catalog_cache.get(filename)
+    if catalog and catalog['mtime'] == stat.st_mtime_ns and catalog['size'] == stat.st_size:
+        return catalog
+
+    with _catalog_lock:
+        catalog = _catalog_cache.get(filename)
+        if catalog and catalog['mtime'] == stat.st_mtime_ns and catalog['size'] == stat.st_size:
+            return catalog
+
+        catalog = _refresh(catalog, filename)
+        catalog['mtime'] = stat.st_mtime_ns
+        catalog['size'] = stat.st_size
+        _catalog_cache[filename] = catalog
+        return catalog
+
+def seed_catalog(catalog, digest, filename=MUSIC_FILE):
+    """Install a prebuilt catalog (e.g. from a snapshot); digest is a sha256 object over the whole file."""
+    stat = os.stat(filename)
+    with _catalog_lock:
+        catalog['digest'] = digest
+        catalog['mtime'] = stat.st_mtime_ns
+        catalog['size'] = stat.st_size
+        _catalog_cache[filename] = catalog
+
+def get_page(catalog, mood, offset=0, limit=DEFAULT_PAGE_SIZE):
+    """Return (JSON array of ranked tracks, total tracks for mood), or None for an unknown mood."""
+    entry = catalog['moods'].get(normalize_mood(mood))
+    if entry is None:
+        return None
+    payloads = entry['payloads']
+    page = _ranking(entry)[offset:offset + limit]
+    return '[' + ','.join(payloads[i] for i in page) + ']', len(payloads)
+
+def get_track(catalog, track_id):
+    """Return the {title, file_path} record for a track ID, or None if there is no such track."""
+    tracks = catalog['tracks']
+    if not 0 <= track_id < len(tracks):
+        return None
+    return tracks[track_id]
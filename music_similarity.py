@@ -0,0 +1,95 @@
+# music_similarity.py
+import json
+import os
+import sys
+
+import numpy as np
+
+import data_cache
+
+def feature_columns(data):
+    # Every 'featureN' column takes part in the similarity
+    return [column for column in data.columns if column.startswith('feature')]
+
+def normalize_rows(features):
+    """L2-normalize each row; all-zero rows stay zero, as in cosine_similarity."""
+    vectors = np.asarray(features, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+def mean_similarity(vectors):
+    # mean_j cos(x_i, x_j) == x_i . mean_j(x_j) for unit rows, so no N x N matrix is needed
+    if len(vectors) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return vectors @ vectors.mean(axis=0)
+
+def top_k(scores, k):
+    """Positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def rank(scores):
+    # Full ordering, best first; ties keep catalog order
+    return np.argsort(-np.asarray(scores), kind='stable')
+
+def build_index(data, columns=None):
+    """Group tracks by mood into one contiguous matrix of unit feature vectors."""
+    columns = columns or feature_columns(data)
+    moods = data['mood'].astype(str).str.strip().str.lower().to_numpy()
+    rows = np.argsort(moods, kind='stable')
+    # Tracks added by the catalog scanner have no hand-entered features yet
+    vectors = normalize_rows(data[columns].fillna(0).to_numpy(dtype=np.float32)[rows])
+
+    index = {"rows": rows, "vectors": vectors, "scores": np.zeros(len(rows), dtype=np.float32), "moods": {}}
+    sorted_moods = moods[rows]
+    starts = np.flatnonzero(np.r_[True, sorted_moods[1:] != sorted_moods[:-1]]) if len(rows) else []
+    for start, stop in zip(starts, list(starts[1:]) + [len(rows)]):
+        index['moods'][sorted_moods[start]] = (int(start), int(stop))
+        index['scores'][start:stop] = mean_similarity(vectors[start:stop])
+    return index
+
+def recommend(index, mood, k=5):
+    """Catalog rows of the k tracks most similar to the rest of their mood, or None for an unknown mood."""
+    bounds = index['moods'].get(str(mood).strip().lower())
+    if bounds is None:
+        return None
+    start, stop = bounds
+    return index['rows'][start:stop][top_k(index['scores'][start:stop], k)]
+
+def similar_to(index, row, k=5, mood=None):
+    """Catalog rows of the k tracks closest to catalog row `row`, optionally within one mood."""
+    position = int(np.flatnonzero(index['rows'] == row)[0])
+    start, stop = index['moods'][mood.strip().lower()] if mood else (0, len(index['rows']))
+
+    scores = index['vectors'][start:stop] @ index['vectors'][position]
+    if start <= position < stop:
+        scores[position - start] = -np.inf
+    found = top_k(scores, k)
+    return index['rows'][start:stop][found[np.isfinite(scores[found])]]
+
+def save_index(index, directory):
+    """Persist the index as .npy arrays that load_index can memory-map."""
+    os.makedirs(directory, exist_ok=True)
+    for name in ('rows', 'vectors', 'scores'):
+        np.save(os.path.join(directory, f'{name}.npy'), index[name])
+    with open(os.path.join(directory, 'moods.json'), 'w', encoding='utf-8') as file:
+        json.dump(index['moods'], file)
+
+def load_index(directory, mmap_mode='r'):
+    index = {
+        name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+        for name in ('rows', 'vectors', 'scores')
+    }
+    with open(os.path.join(directory, 'moods.json'), encoding='utf-8') as file:
+        index['moods'] = {mood: tuple(bounds) for mood, bounds in json.load(file).items()}
+    return index
+
+if __name__ == '__main__':
+    # Offline build: python music_similarity.py [music_data.csv] [output directory]
+    source = sys.argv[1] if len(sys.argv) > 1 else 'music_data.csv'
+    target = sys.argv[2] if len(sys.argv) > 2 else 'music_index'
+    save_index(build_index(data_cache.load_csv(source)), target)
+    print(f"Saved similarity index for {source} to {target}")
@@ -1,27 +1,41 @@
 # music_therapy.py
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 import pygame
 
+import audio_features
+import data_cache
+import music_similarity
+
 # Initialize pygame mixer
 pygame.mixer.init()
 
 # Load the dataset (Ensure CSV has columns: 'title', 'file_path', 'mood', and 'feature1', 'feature2', etc.)
-data = pd.read_csv('music_data.csv')
+data = data_cache.load_csv('music_data.csv')
+
+# Prefer extracted audio descriptors over the hand-entered features once the store is built
+feature_store = audio_features.load_feature_store()
+if feature_store is not None:
+    data = audio_features.with_store_features(data, feature_store)
+
+# Unit feature vectors grouped by mood, built once for all recommendation calls
+similarity_index = music_similarity.build_index(data)
 
 # Function to get music recommendations based on mood
-def get_recommendations(mood):
-    filtered_data = data[data['mood'].str.lower() == mood.lower()]
-    
-    if filtered_data.empty:
+def get_recommendations(mood, k=5):
+    # Rank by mean cosine similarity within the mood, computed through the mood centroid
+    rows = music_similarity.recommend(similarity_index, mood, k)
+    if rows is None or len(rows) == 0:
         return None
 
-    # Calculate cosine similarity for music features
-    features = filtered_data[['feature1', 'feature2', 'feature3']]
-    sim_scores = cosine_similarity(features).mean(axis=1)
-    top_indices = sim_scores.argsort()[-5:][::-1]  # Get top 5 recommendations
+    return data.iloc[rows]
+
+# Function to find songs that sound like a given one
+def get_similar_songs(title, k=5):
+    matches = data.index[data['title'] == title]
+    if len(matches) == 0:
+        return None
 
-    return filtered_data.iloc[top_indices]
+    rows = music_similarity.similar_to(similarity_index, data.index.get_loc(matches[0]), k)
+    return data.iloc[rows]
 
 # Function to play the song with option to stop
 def play_song(file_path):
@@ -0,0 +1,158 @@
+# request_log.py
+import atexit
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+# 'sync' keeps the plain-text FileHandler; 'queue' hands records to a background JSON-lines writer
+LOG_MODE = os.environ.get('SERENE_LOG_MODE', 'sync')
+
+LOG_MAX_BYTES = int(os.environ.get('SERENE_LOG_MAX_BYTES', 50 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('SERENE_LOG_BACKUP_COUNT', 5))
+LOG_QUEUE_SIZE = int(os.environ.get('SERENE_LOG_QUEUE_SIZE', 10000))
+
+# Records written per batch, and how long the writer sleeps when there is nothing to write
+LOG_BATCH_SIZE = 512
+LOG_FLUSH_INTERVAL = 0.05
+
+# The active RequestLog in queue mode, or None
+_request_log = None
+
+class RequestLog:
+    """Bounded in-memory buffer drained to a rotating JSON-lines file by a background thread.
+
+    put() never blocks: when the buffer is full the record is dropped and counted.
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                 queue_size=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.written = 0
+        self._file = None
+        self._start()
+        # Threads do not survive fork, so every forked worker gets its own buffer and writer
+        os.register_at_fork(after_in_child=self._start)
+        atexit.register(self.close)
+
+    def _start(self):
+        self._pending = collections.deque()
+        self._file = None
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-log-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        # deque.append is atomic under the GIL, so request threads never wait on a lock
+        if len(self._pending) >= self.queue_size:
+            self.dropped += 1
+        else:
+            self._pending.append(record)
+
+    def stats(self):
+        return {"pending": len(self._pending), "written": self.written, "dropped": self.dropped}
+
+    def _run(self):
+        while True:
+            stopping = self._stopping.is_set()
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popleft())
+            if batch:
+                self._write(''.join(json.dumps(_as_dict(record), default=str) + '\n' for record in batch))
+                self.written += len(batch)
+            elif stopping:
+                return
+            else:
+                self._stopping.wait(LOG_FLUSH_INTERVAL)
+
+    def _write(self, text):
+        data = text.encode('utf-8')
+        self._open()
+        if self._file.tell() and self._file.tell() + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+
+    def _open(self):
+        # Reopen if another process sharing the file has rotated it
+        if self._file is not None:
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino:
+                    return
+            except FileNotFoundError:
+                pass
+            self._file.close()
+        self._file = open(self.path, 'ab', buffering=0)
+
+    def _rotate(self):
+        self._file.close()
+        for number in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{number}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{number + 1}')
+        if self.backup_count:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'ab', buffering=0)
+
+    def close(self):
+        """Write out everything still buffered and stop the writer."""
+        self._stopping.set()
+        self._thread.join(timeout=5)
+
+class _BufferHandler(logging.Handler):
+    # Routes ordinary logging calls into the same non-blocking buffer
+    def __init__(self, request_log):
+        super().__init__()
+        self.request_log = request_log
+
+    def emit(self, record):
+        self.request_log.put(record)
+
+def _as_dict(record):
+    # LogRecords are only formatted here, on the writer thread
+    if isinstance(record, logging.LogRecord):
+        return {
+            "time": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+    return record
+
+def setup_logging(filename='app.log'):
+    """Configure the root logger for LOG_MODE; in queue mode records go to SERENE_LOG_FILE as JSON lines."""
+    global _request_log
+    if LOG_MODE != 'queue':
+        logging.basicConfig(filename=filename, level=logging.INFO,
+                            format='%(asctime)s %(levelname)s: %(message)s')
+        return None
+
+    if _request_log is None:
+        path = os.environ.get('SERENE_LOG_FILE', os.path.splitext(filename)[0] + '.jsonl')
+        _request_log = RequestLog(path)
+        # Per-request details travel in the structured events, so only warnings and errors are logged
+        logging.basicConfig(level=logging.WARNING, handlers=[_BufferHandler(_request_log)])
+    return _request_log
+
+def log_request(endpoint, latency, fields=None, status=None):
+    """Record one request (latency in seconds) as a structured event; a no-op outside queue mode."""
+    if _request_log is None:
+        return
+    event = {"time": round(time.time(), 6), "endpoint": endpoint, "latency_ms": round(latency * 1000, 3)}
+    if status is not None:
+        event['status'] = status
+    if fields:
+        event.update(fields)
+    _request_log.put(event)
+
+def stats():
+    return _request_log.stats() if _request_log is not None else None
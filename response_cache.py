@@ -0,0 +1,74 @@
+# response_cache.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Encoded responses kept per dataset, least recently used first out; 0 disables the cache
+CACHE_ENTRIES = int(os.environ.get('SERENE_RESPONSE_CACHE_ENTRIES', 4096))
+
+# max-age sent with cached responses; 0 sends no-cache, so clients revalidate with If-None-Match every time
+MAX_AGE = int(os.environ.get('SERENE_RESPONSE_MAX_AGE', 0))
+
+def make_etag(version, key):
+    """Strong ETag for the response to key under a data version (unquoted, as Werkzeug's set_etag takes it)."""
+    return f'{version}-{hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()}'
+
+class ResponseCache:
+    """Encoded response bodies by dataset and normalized request, each with its ETag.
+
+    Every dataset holds entries for one data version only: the first lookup with a new
+    version drops all of that dataset's entries, so a reload invalidates them at once.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._start()
+        # A lock held by another thread at fork would never be released in the child
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def _entries(self, dataset, version):
+        # Called with the lock held
+        current = self._datasets.get(dataset)
+        if current is None or current[0] != version:
+            if current is not None:
+                self.invalidations += 1
+            current = self._datasets[dataset] = (version, OrderedDict())
+        return current[1]
+
+    def get(self, dataset, version, key):
+        """(etag, body) cached for key under version, or None."""
+        with self._lock:
+            entries = self._entries(dataset, version)
+            entry = entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, dataset, version, key, body):
+        """Cache body (bytes) for key under version; returns its (etag, body)."""
+        entry = (make_etag(version, key), body)
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            entries = self._entries(dataset, version)
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            entries = sum(len(entries) for _, entries in self._datasets.values())
+        return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations, "entries": entries}
@@ -0,0 +1,266 @@
+# sentiment_batch.py
+import itertools
+import string
+import sys
+import threading
+import time
+
+import numpy as np
+from vaderSentiment.vaderSentiment import (BOOSTER_DICT, C_INCR, N_SCALAR, NEGATE, SPECIAL_CASES,
+                                           SentimentIntensityAnalyzer)
+
+# Below this many texts the fixed cost of the array pipeline outweighs scoring one by one
+SMALL_BATCH = 16
+
+# Raw tokens remembered per engine before the token cache is started afresh
+TOKEN_CACHE_SIZE = 500000
+
+# Reserved token ids: neighbours before the start of a text, and words VADER has no rule for
+PAD, UNKNOWN, UNKNOWN_NEGATED = 0, 1, 2
+
+# Words the rules below refer to by name
+_NAMED = ('no', 'or', 'nor', 'least', 'at', 'very', 'never', 'so', 'this', 'without', 'doubt', 'but')
+
+# Multi-word phrases VADER matches around a lexicon word (idioms and 'kind of'-style boosters)
+_PHRASES = [key for key in list(SPECIAL_CASES) + list(BOOSTER_DICT) if ' ' in key]
+
+def _negated(word):
+    # vaderSentiment.negated() for a single lowercase word
+    return word in NEGATE or "n't" in word
+
+def compile_engine(analyzer):
+    """Precompile the analyzer's lexicon into integer token ids with per-id rule tables."""
+    words = set(analyzer.lexicon) | set(BOOSTER_DICT) | set(NEGATE) | set(_NAMED)
+    words.update(word for phrase in _PHRASES for word in phrase.split())
+    words = sorted(word for word in words if ' ' not in word)
+    vocabulary = {word: i for i, word in enumerate(words, start=3)}
+
+    size = len(words) + 3
+    valence = np.zeros(size)
+    in_lexicon = np.zeros(size, dtype=bool)
+    booster = np.zeros(size)
+    negation = np.zeros(size, dtype=bool)
+    negation[UNKNOWN_NEGATED] = True
+    for word, i in vocabulary.items():
+        if word in analyzer.lexicon:
+            valence[i] = analyzer.lexicon[word]
+            in_lexicon[i] = True
+        booster[i] = BOOSTER_DICT.get(word, 0.0)
+        negation[i] = _negated(word)
+
+    return {
+        "analyzer": analyzer,
+        "vocabulary": vocabulary,
+        "valence": valence,
+        "in_lexicon": in_lexicon,
+        "booster": booster,
+        "negation": negation,
+        "named": {word: vocabulary[word] for word in _NAMED},
+        "phrases": [tuple(vocabulary[word] for word in phrase.split()) for phrase in _PHRASES],
+        "emoji_chars": frozenset(analyzer.emojis),
+        "tokens": {}
+    }
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+def get_engine():
+    """Engine over a fresh SentimentIntensityAnalyzer, compiled on first use."""
+    global _default_engine
+    if _default_engine is None:
+        with _default_engine_lock:
+            if _default_engine is None:
+                _default_engine = compile_engine(SentimentIntensityAnalyzer())
+    return _default_engine
+
+def _replace_emojis(emojis, text):
+    # Same substitution as the start of polarity_scores()
+    replaced = []
+    prev_space = True
+    for char in text:
+        if char in emojis:
+            if not prev_space:
+                replaced.append(' ')
+            replaced.append(emojis[char])
+            prev_space = False
+        else:
+            replaced.append(char)
+            prev_space = char == ' '
+    return ''.join(replaced).strip()
+
+def _encode(vocabulary, token):
+    # Token id times two, plus one if the token is ALL CAPS
+    stripped = token.strip(string.punctuation)
+    if len(stripped) <= 2:
+        stripped = token  # Probably an emoticon
+    lower = stripped.lower()
+    i = vocabulary.get(lower)
+    if i is None:
+        i = UNKNOWN_NEGATED if "n't" in lower else UNKNOWN
+    return i * 2 + stripped.isupper()
+
+def _encode_tokens(engine, tokens):
+    known = engine['tokens']
+    if len(known) > TOKEN_CACHE_SIZE:
+        # Rebinding (not clearing) leaves concurrent callers with the dict they already hold
+        known = engine['tokens'] = {}
+    for token in set(tokens).difference(known):
+        known[token] = _encode(engine['vocabulary'], token)
+    return np.fromiter(map(known.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+
+def _either(ids, first, second):
+    return (ids == first) | (ids == second)
+
+def _but_check(sentiments, but_at):
+    # Port of SentimentIntensityAnalyzer._but_check, including how it locates values with list.index()
+    for position in range(len(sentiments)):
+        sentiment = sentiments[position]
+        first = sentiments.index(sentiment)
+        if first < but_at:
+            sentiments[first] = sentiment * 0.5
+        elif first > but_at:
+            sentiments[first] = sentiment * 1.5
+    return sentiments
+
+def score_many(texts, engine=None):
+    """VADER compound scores for many texts at once, as a float array.
+
+    Matches SentimentIntensityAnalyzer.polarity_scores(text)['compound']. The few texts
+    containing one of VADER's multi-word phrases ('kind of', 'the bomb', ...) are scored
+    by polarity_scores itself.
+    """
+    engine = engine or get_engine()
+    analyzer = engine['analyzer']
+    count = len(texts)
+    if count < SMALL_BATCH:
+        return np.array([analyzer.polarity_scores(text)['compound'] for text in texts], dtype=np.float64)
+
+    originals = texts
+    # Every emoji is non-ASCII, so most texts skip the per-character substitution entirely
+    emoji_chars = engine['emoji_chars']
+    texts = [text if text.isascii() or emoji_chars.isdisjoint(text) else _replace_emojis(analyzer.emojis, text)
+             for text in texts]
+
+    # Tokenize the whole batch into one flat array of codes
+    split = [text.split() for text in texts]
+    lengths = np.fromiter(map(len, split), dtype=np.int64, count=count)
+    codes = _encode_tokens(engine, list(itertools.chain.from_iterable(split)))
+    ids, upper = codes >> 1, (codes & 1).astype(bool)
+    text_of = np.repeat(np.arange(count), lengths)
+    starts = np.cumsum(lengths) - lengths
+    position = np.arange(len(codes)) - starts[text_of]
+
+    def before(k):
+        # Code of the token k places earlier in the same text, PAD at the start
+        shifted = np.full(len(codes), PAD * 2, dtype=np.int64)
+        shifted[k:] = codes[:max(len(codes) - k, 0)]
+        shifted[position < k] = PAD * 2
+        return shifted
+
+    def after(k):
+        shifted = np.full(len(codes), PAD * 2, dtype=np.int64)
+        shifted[:max(len(codes) - k, 0)] = codes[k:]
+        shifted[position + k >= lengths[text_of]] = PAD * 2
+        return shifted
+
+    previous = [codes] + [before(k) for k in (1, 2, 3)]
+
+    # Texts with a multi-word phrase take the reference path
+    fallback = np.zeros(count, dtype=bool)
+    present = set(ids.tolist())
+    for phrase in engine['phrases']:
+        if not present.issuperset(phrase):
+            continue
+        found = np.ones(len(codes), dtype=bool)
+        for k, word in enumerate(reversed(phrase)):
+            found &= previous[k] >> 1 == word
+        fallback[text_of[found]] = True
+
+    # ALL CAPS emphasis only applies when some, but not all, words of a text are capitalised
+    capitals = np.bincount(text_of, weights=upper, minlength=count)
+    cap_differential = ((capitals > 0) & (capitals < lengths))[text_of]
+
+    valence, in_lexicon, booster, negation = engine['valence'], engine['in_lexicon'], engine['booster'], engine['negation']
+    named = engine['named']
+    so_this = [named['so'], named['this']]
+
+    # Only lexicon words that are not boosters carry sentiment; everything below works on those
+    scored = np.flatnonzero(in_lexicon[ids] & (booster[ids] == 0))
+    word, cap, at = ids[scored], upper[scored] & cap_differential[scored], position[scored]
+    previous = [codes_k[scored] for codes_k in previous]
+    prev_ids = [codes_k >> 1 for codes_k in previous]
+    next_id = after(1)[scored] >> 1
+
+    lexical = valence[word]
+    v = np.where((word == named['no']) & in_lexicon[next_id], 0.0, lexical)
+    no_before = (prev_ids[1] == named['no']) | (prev_ids[2] == named['no']) | \
+        ((prev_ids[3] == named['no']) & _either(prev_ids[1], named['or'], named['nor']))
+    v = np.where(no_before, lexical * N_SCALAR, v)
+    v = np.where(cap, np.where(v > 0, v + C_INCR, v - C_INCR), v)
+
+    # Boosters and negations up to three words back, nearest first
+    for k in (1, 2, 3):
+        applies = (at >= k) & ~in_lexicon[prev_ids[k]]
+        boost = booster[prev_ids[k]]
+        scalar = np.where(v < 0, -boost, boost)
+        boost_cap = (previous[k] & 1).astype(bool) & cap_differential[scored] & (boost != 0)
+        scalar = np.where(boost_cap, np.where(v > 0, scalar + C_INCR, scalar - C_INCR), scalar)
+        if k == 2:
+            scalar = scalar * 0.95
+        elif k == 3:
+            scalar = scalar * 0.9
+        v = np.where(applies, v + scalar, v)
+
+        if k == 1:
+            negated = negation[prev_ids[1]]
+            v = np.where(applies & negated, v * N_SCALAR, v)
+        elif k == 2:
+            never = (prev_ids[2] == named['never']) & _either(prev_ids[1], *so_this)
+            without_doubt = (prev_ids[2] == named['without']) & (prev_ids[1] == named['doubt'])
+            v = np.where(applies & never, v * 1.25, v)
+            v = np.where(applies & ~never & ~without_doubt & negation[prev_ids[2]], v * N_SCALAR, v)
+        else:
+            never = ((prev_ids[3] == named['never']) & _either(prev_ids[2], *so_this)) | _either(prev_ids[1], *so_this)
+            without_doubt = (prev_ids[3] == named['without']) & \
+                ((prev_ids[2] == named['doubt']) | (prev_ids[1] == named['doubt']))
+            v = np.where(applies & never, v * 1.25, v)
+            v = np.where(applies & ~never & ~without_doubt & negation[prev_ids[3]], v * N_SCALAR, v)
+
+    # 'least' negates the next word, except in 'at least' and 'very least'
+    least = prev_ids[1] == named['least']
+    v = np.where(least & (at > 1) & ~_either(prev_ids[2], named['at'], named['very']), v * N_SCALAR, v)
+    v = np.where(least & (at == 1), v * N_SCALAR, v)
+
+    sentiments = np.zeros(len(codes))
+    sentiments[scored] = v
+
+    # 'but' halves what comes before it and boosts what follows; rare enough to port as is
+    first_but = np.flatnonzero(ids == named['but'])
+    for text in np.unique(text_of[first_but]):
+        start, stop = starts[text], starts[text] + lengths[text]
+        but_at = int(np.argmax(ids[start:stop] == named['but']))
+        sentiments[start:stop] = _but_check(sentiments[start:stop].tolist(), but_at)
+
+    # Sum per text (bincount adds in token order, like sum()), add punctuation emphasis and normalize
+    total = np.bincount(text_of, weights=sentiments, minlength=count)
+    exclamations = np.minimum(np.fromiter((text.count('!') for text in texts), dtype=np.int64, count=count), 4)
+    questions = np.fromiter((text.count('?') for text in texts), dtype=np.int64, count=count)
+    emphasis = exclamations * 0.292 + np.where(questions > 3, 0.96, np.where(questions > 1, questions * 0.18, 0))
+    total = np.where(total > 0, total + emphasis, np.where(total < 0, total - emphasis, total))
+    compound = np.clip(total / np.sqrt(total * total + 15), -1.0, 1.0)
+
+    # round() rather than np.round so scores on a 0.00005 boundary round exactly as VADER's do
+    scores = np.fromiter((round(score, 4) for score in compound.tolist()), dtype=np.float64, count=count)
+    for i in np.flatnonzero(fallback):
+        scores[i] = analyzer.polarity_scores(originals[i])['compound']
+    return scores
+
+if __name__ == '__main__':
+    # Score a text file, one message per line: python sentiment_batch.py messages.txt > scores.txt
+    with open(sys.argv[1], encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    started = time.perf_counter()
+    results = score_many(lines)
+    elapsed = time.perf_counter() - started
+    sys.stdout.write(''.join(f'{score}\n' for score in results))
+    print(f"Scored {len(lines)} texts in {elapsed:.2f}s", file=sys.stderr)
@@ -0,0 +1,236 @@
+# sentiment_scheduler.py
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import sentiment_batch
+
+# 'off' scores in the request thread; 'thread' or 'process' batches concurrent requests for a worker pool
+BATCHING_MODE = os.environ.get('SERENE_SENTIMENT_BATCHING', 'off')
+
+# Longest a request waits for others to join its batch, and the largest batch
+BATCH_WINDOW = float(os.environ.get('SERENE_SENTIMENT_BATCH_WINDOW_MS', 2)) / 1000
+BATCH_MAX = int(os.environ.get('SERENE_SENTIMENT_BATCH_MAX', 256))
+
+# Scoring workers (threads or processes)
+BATCH_WORKERS = int(os.environ.get('SERENE_SENTIMENT_WORKERS', 2))
+
+# The window grows from this fraction of BATCH_WINDOW while batches keep filling, and halves while they don't
+WINDOW_STEP = 0.125
+
+# Batches smaller than sentiment_batch.SMALL_BATCH are scored one by one, so they only add the handoff
+# cost; after this many in a row, requests are scored in their own thread for BACKOFF seconds
+SMALL_BATCH_LIMIT = 8
+BACKOFF = 1.0
+
+_process_engine = None
+
+def _init_process():
+    global _process_engine
+    _process_engine = sentiment_batch.get_engine()
+
+def _score_in_process(texts):
+    return sentiment_batch.score_many(texts, _process_engine).tolist()
+
+def _score_in_thread(texts, engine):
+    return sentiment_batch.score_many(texts, engine).tolist()
+
+class SentimentScheduler:
+    """Collects concurrent scoring requests into batches for sentiment_batch.score_many.
+
+    At low traffic a request is scored right away in its own thread, as without the
+    scheduler, while no other request is being scored that way. Once requests start
+    overlapping, each batch is held open for a window (up to `window` seconds) that doubles
+    while batches have company and halves when they go out alone. The batch closes early
+    once as many texts are waiting as went into the previous batch (at least
+    sentiment_batch.SMALL_BATCH, at most `max_batch`),
+    so a steady number of concurrent clients is not kept waiting for the whole window.
+    While every worker is busy, requests keep queueing, so batches grow with load.
+
+    Batching only pays once batches reach that size. When too few clients
+    overlap for that, `SMALL_BATCH_LIMIT` small batches in a row send every request back to
+    its own thread for `BACKOFF` seconds, after which the scheduler tries again.
+    """
+
+    def __init__(self, engine, mode='thread', window=BATCH_WINDOW, max_batch=BATCH_MAX, workers=BATCH_WORKERS):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown batching mode: {mode!r}")
+        self.engine = engine
+        self.mode = mode
+        self.max_window = window
+        self.max_batch = max_batch
+        self.workers = workers
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.inline = 0
+        self._start()
+        # Pools and threads do not survive fork, so every forked worker starts its own on first use
+        os.register_at_fork(after_in_child=self._start)
+        atexit.register(self.close)
+
+    def _start(self):
+        self.window = 0.0
+        self.target = 1
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+        self._idle = threading.Semaphore(self.workers)
+        self._inline = threading.Lock()
+        self._small_batches = 0
+        self._backoff_until = 0.0
+        self._pool = None
+        self._thread = None
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._pool is None:
+            if self.mode == 'process':
+                # Workers build their own engine, so nothing unpicklable crosses the process boundary
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_process)
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='sentiment-worker')
+            self._thread = threading.Thread(target=self._run, name='sentiment-scheduler', daemon=True)
+            self._thread.start()
+
+    def _score_here(self, text):
+        # The compound score of text when it is to be scored in the calling thread, otherwise None
+        if self._queue:
+            return None
+        # Backing off: score here, however many requests overlap
+        if time.perf_counter() < self._backoff_until:
+            self.inline += 1
+            return self.engine['analyzer'].polarity_scores(text)['compound']
+        # Nothing to batch with: score here, exactly as without the scheduler
+        if self.window == 0.0 and self._inline.acquire(blocking=False):
+            try:
+                self.inline += 1
+                return self.engine['analyzer'].polarity_scores(text)['compound']
+            finally:
+                self._inline.release()
+        return None
+
+    def _enqueue(self, text):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The sentiment scheduler is closed")
+            self._ensure_started()
+            self._queue.append((text, future))
+            # Wake the scheduler for the first text and once the batch is full, not for every arrival
+            if len(self._queue) == 1 or len(self._queue) >= self.target:
+                self._arrived.notify()
+        return future
+
+    def submit(self, text):
+        """Future resolving to the compound score of text."""
+        try:
+            score = self._score_here(text)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        if score is None:
+            return self._enqueue(text)
+        future = Future()
+        future.set_result(score)
+        return future
+
+    def score(self, text):
+        # Scored here, without a Future, whenever submit() would have done so
+        score = self._score_here(text)
+        return self._enqueue(text).result() if score is None else score
+
+    def _run(self):
+        while True:
+            # Only form a batch once a worker can take it; meanwhile the queue grows
+            self._idle.acquire()
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._arrived.wait()
+                if not self._queue:
+                    self._idle.release()
+                    return
+                deadline = time.perf_counter() + self.window
+                while len(self._queue) < self.target and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._arrived.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch))]
+                self._adapt(len(batch))
+
+            texts = [text for text, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                if self.mode == 'process':
+                    result = self._pool.submit(_score_in_process, texts)
+                else:
+                    result = self._pool.submit(_score_in_thread, texts, self.engine)
+            except RuntimeError as e:
+                self._idle.release()
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            result.add_done_callback(lambda result, futures=futures: self._resolve(result, futures))
+
+    def _adapt(self, size):
+        # Called with the lock held
+        self.batches += 1
+        self.items += size
+        self.largest_batch = max(self.largest_batch, size)
+        # Aim for the same size next time, and never below the size the array pipeline starts at;
+        # a batch that grew while workers were busy raises the aim
+        self.target = max(sentiment_batch.SMALL_BATCH, min(size, self.max_batch))
+        if size > 1:
+            self.window = min(self.max_window, max(self.window * 2, self.max_window * WINDOW_STEP))
+        else:
+            self.window = self.window / 2 if self.window > self.max_window * WINDOW_STEP else 0.0
+        self._small_batches = self._small_batches + 1 if size < sentiment_batch.SMALL_BATCH else 0
+        if self._small_batches >= SMALL_BATCH_LIMIT:
+            self._small_batches = 0
+            self.window = 0.0
+            self._backoff_until = time.perf_counter() + BACKOFF
+
+    def _resolve(self, result, futures):
+        self._idle.release()
+        error = result.exception()
+        if error is not None:
+            for future in futures:
+                future.set_exception(error)
+            return
+        for future, score in zip(futures, result.result()):
+            future.set_result(score)
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._queue),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "inline": self.inline,
+            "window_seconds": self.window,
+            "target_batch": self.target
+        }
+
+    def close(self):
+        """Score everything queued, then stop the scheduler and its workers."""
+        with self._lock:
+            self._closed = True
+            self._arrived.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+def create_scheduler(engine, mode=BATCHING_MODE):
+    """A scheduler for BATCHING_MODE, or None when batching is off."""
+    if mode == 'off':
+        return None
+    return SentimentScheduler(engine, mode)
@@ -0,0 +1,74 @@
+# snapshot.py
+# Build with: python snapshot.py  (writes SERENE_SNAPSHOT, default serene_snapshot.pkl)
+import hashlib
+import os
+import pickle
+import sys
+
+# Bump whenever the structure of a snapshotted artifact changes
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_FILE = os.environ.get('SERENE_SNAPSHOT', 'serene_snapshot.pkl')
+
+# Data file each artifact is built from; an artifact is only used while its file is unchanged
+SOURCES = {
+    "habit_lookup": 'habit_data.csv',
+    "response_pools": 'responses.csv',
+    "cluster_index": 'habits_data.csv',
+    "music_catalog": 'music_data.csv'
+}
+
+def _digest(filename):
+    with open(filename, 'rb') as file:
+        return hashlib.sha256(file.read())
+
+def save_snapshot(artifacts, path=SNAPSHOT_FILE):
+    state = {
+        "version": SNAPSHOT_VERSION,
+        "sources": {name: _digest(SOURCES[name]).hexdigest() for name in artifacts if name in SOURCES},
+        "artifacts": artifacts
+    }
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """Return ({name: artifact}, {name: sha256 of its source}) for every artifact that is still valid."""
+    if not path or not os.path.exists(path):
+        return {}, {}
+    with open(path, 'rb') as file:
+        state = pickle.load(file)
+    if state.get('version') != SNAPSHOT_VERSION:
+        return {}, {}
+
+    artifacts, digests = {}, {}
+    for name, artifact in state['artifacts'].items():
+        source = SOURCES.get(name)
+        if source is not None:
+            digest = _digest(source)
+            if digest.hexdigest() != state['sources'][name]:
+                continue
+            digests[name] = digest
+        artifacts[name] = artifact
+    return artifacts, digests
+
+def build_snapshot(path=SNAPSHOT_FILE):
+    """Build every artifact from the CSV files (ignoring any existing snapshot) and save it."""
+    os.environ['SERENE_SNAPSHOT'] = ''
+    import app
+
+    app.warm_up()
+    models = app.registry.current()
+    save_snapshot({
+        "habit_lookup": models['habit_lookup'],
+        "response_pools": models['response_pools'],
+        "cluster_index": models['cluster_index'],
+        "music_catalog": dict(models['music_catalog'], digest=None),  # Rebuilt from the file when loaded
+        "sentiment_analyzer": app.sentiment_analyzer
+    }, path)
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_FILE
+    build_snapshot(target)
+    print(f"Saved snapshot version {SNAPSHOT_VERSION} to {target}")
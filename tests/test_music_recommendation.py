@@ -0,0 +1,28 @@
+# tests/test_music_recommendation.py
+# Run from the project directory: python -m pytest tests
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app
+
+def post(payload):
+    return app.app.test_client().post('/music_recommendation', json=payload)
+
+def test_page_is_valid_json():
+    mood = next(iter(app.registry.get('music_catalog')['moods']))
+    response = post({"mood": mood, "offset": 0, "limit": 1})
+    assert response.status_code == 200
+    body = json.loads(response.get_data(as_text=True))
+    assert body['offset'] == 0 and body['limit'] == 1 and len(body['recommendations']) == 1
+
+def test_boolean_bounds_are_rejected():
+    mood = next(iter(app.registry.get('music_catalog')['moods']))
+    for payload in ({"mood": mood, "limit": True}, {"mood": mood, "offset": False}):
+        response = post(payload)
+        assert response.status_code == 400
+        assert 'error' in json.loads(response.get_data(as_text=True))
@@ -0,0 +1,31 @@
+# tests/test_sentiment_batch.py
+# Run from the project directory: python -m pytest tests
+import csv
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sentiment_batch
+from benchmarks.sentiment_equivalence import CASES, generated
+
+def reference(texts):
+    analyzer = sentiment_batch.get_engine()['analyzer']
+    return [analyzer.polarity_scores(text)['compound'] for text in texts]
+
+def test_cases_match_polarity_scores():
+    assert sentiment_batch.score_many(CASES).tolist() == reference(CASES)
+
+def test_responses_match_polarity_scores():
+    with open(os.path.join(ROOT, 'responses.csv'), encoding='utf-8') as file:
+        texts = [row['Response'] for row in csv.DictReader(file)]
+    assert sentiment_batch.score_many(texts).tolist() == reference(texts)
+
+def test_generated_corpus_matches_polarity_scores():
+    texts = generated(5000, seed=1)
+    assert sentiment_batch.score_many(texts).tolist() == reference(texts)
+
+def test_small_batches_match_polarity_scores():
+    texts = CASES[:sentiment_batch.SMALL_BATCH - 1]
+    assert sentiment_batch.score_many(texts).tolist() == reference(texts)
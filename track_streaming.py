@@ -0,0 +1,77 @@
+# track_streaming.py
+import mmap
+import ntpath
+import os
+
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+# Directory holding the MP3 files referenced by music_data.csv
+MUSIC_DIR = os.environ.get('MUSIC_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+# Bytes handed to the server per iteration when a file is not sent with sendfile
+CHUNK_SIZE = 256 * 1024
+
+def resolve_track_file(file_path, music_dir=MUSIC_DIR):
+    """Map a catalog file_path to a file inside music_dir, or None if it is not there."""
+    # Catalog paths may be Windows paths from another machine; only the file name is trusted
+    name = ntpath.basename(file_path)
+    if not name or name in ('.', '..'):
+        return None
+    path = os.path.join(music_dir, name)
+    return path if os.path.isfile(path) else None
+
+def _mmap_chunks(path, start, stop):
+    # Serve a bounded range straight out of the page cache instead of read() calls
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for offset in range(start, stop, CHUNK_SIZE):
+            yield mapped[offset:min(offset + CHUNK_SIZE, stop)]
+
+def stream_file(path, mimetype='audio/mpeg'):
+    """Send path for the current request, honouring If-None-Match, If-Range and a single Range."""
+    file = open(path, 'rb')
+    stat = os.fstat(file.fileno())
+    size = stat.st_size
+    etag = f'{stat.st_ino:x}-{size:x}-{stat.st_mtime_ns:x}'
+
+    response = Response(mimetype=mimetype, direct_passthrough=True)
+    response.set_etag(etag)
+    response.last_modified = int(stat.st_mtime)
+    response.accept_ranges = 'bytes'
+
+    if request.if_none_match.contains_weak(etag):
+        file.close()
+        response.status_code = 304
+        return response
+
+    # A stale If-Range validator means the client must get the whole file again
+    byte_range = request.range
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        byte_range = None
+    elif if_range.date is not None and if_range.date.timestamp() < int(stat.st_mtime):
+        byte_range = None
+    if byte_range is not None and len(byte_range.ranges) != 1:
+        byte_range = None
+
+    start, stop = 0, size
+    if byte_range is not None:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            file.close()
+            response.status_code = 416
+            response.headers['Content-Range'] = f'bytes */{size}'
+            return response
+        start, stop = bounds
+        response.status_code = 206
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+    if stop == size:
+        # Runs to the end of the file, so the server's file wrapper can use sendfile
+        file.seek(start)
+        response.response = wrap_file(request.environ, file, CHUNK_SIZE)
+    else:
+        file.close()
+        response.response = _mmap_chunks(path, start, stop)
+    response.content_length = stop - start
+    return response